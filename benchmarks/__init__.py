@@ -0,0 +1,6 @@
+'''Benchmarks for iquito_dict.
+
+liftgen writes synthetic LIFT exports of any size and suite times each
+stage of a dictionary build on them. Run `python -m benchmarks.suite`
+from the repository root.
+'''
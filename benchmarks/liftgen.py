@@ -0,0 +1,189 @@
+'''Generate synthetic LIFT exports for benchmarking.
+
+The entries are built from the Iquito alphabet and use the part of speech,
+variant type and field names that iquito_dict handles, so the generated
+files go through every path of a dictionary build: citation forms, variant
+relations, irregular forms, related forms, entries excluded by their Entry
+History, possessive prefixes, sense notes, examples and reversals in en, es
+and eu.
+
+    python -m benchmarks.liftgen 10000 synthetic.lift
+'''
+
+import argparse
+import random
+import sys
+from xml.sax.saxutils import escape, quoteattr
+
+import iquito_dict as iqdict
+
+consonants = ['k', 'kw', 'm', 'n', 'p', 'r', 's', 't', 'j', 'y', 'w', 'ch', 'sh']
+vowels = [
+    'a', 'á', 'aa', 'aá', 'áá', 'à',
+    'i', 'í', 'ii', 'ií', 'íí', 'ì',
+    'ɨ', 'ɨ́', 'ɨɨ', 'ɨɨ́', 'ɨ́ɨ́', 'ɨ̀',
+    'u', 'ú', 'uu', 'uú', 'úú', 'ù',
+]
+words_en = (
+    'the a house to go big small eat drink river fish tree word run hand '
+    'water canoe manioc village rain forest child sing cut \\sp{Inga}'
+).split()
+words_es = (
+    'árbol casa ñandú río pez éxito ícono uña agua ópalo canoa yuca pueblo '
+    'lluvia monte niño cantar cortar ¿qué? “dicho” \\sci{Inga}'
+).split()
+parts_of_speech = sorted(iqdict.posmap_en) + ['derivational verb root']
+variant_types = sorted(iqdict.varmap)
+entry_fields = [
+    ('literal-meaning', 'en'), ('literal-meaning', 'eu'),
+    ('Entry Anthro', 'eu'), ('Entry Semantics', 'eu'), ('Entry Grammar', 'eu'),
+    ('Entry Socioling', 'eu'), ('Alternate Pronunciation', 'eu'),
+]
+form_fields = ['Irreg Pl', 'Irreg Poss', 'Irreg Poss Pl', 'Alternate Pronunciation']
+root_fields = ['Deriv Root', 'RelForm 1 root', 'RelForm 2 root']
+note_types = ['anthropology', 'semantics', 'grammar', 'sociolinguistics', 'discourse']
+
+class LiftGenerator(object):
+    '''Writer of synthetic LIFT entries, seeded for reproducible output.'''
+    def __init__(self, seed=1):
+        self.random = random.Random(seed)
+
+    def word(self):
+        '''Return a random Iquito word.'''
+        r = self.random
+        w = ''.join(
+            r.choice(consonants) + r.choice(vowels) for _ in range(r.randint(1, 4))
+        )
+        if r.random() < 0.05:
+            w = w.capitalize()
+        if r.random() < 0.04:
+            w = '-' + w
+        elif r.random() < 0.04:
+            w = w + '=' + r.choice(vowels)
+        return w
+
+    def text(self, words, maxlen=4):
+        '''Return random text of 1 to `maxlen` of `words`.'''
+        r = self.random
+        return ' '.join(r.choice(words) for _ in range(r.randint(1, maxlen)))
+
+    @staticmethod
+    def form(lang, text):
+        return f'<form lang="{lang}"><text>{escape(text)}</text></form>'
+
+    def field(self, ftype, *forms):
+        return f'<field type={quoteattr(ftype)}>' + ''.join(forms) + '</field>'
+
+    def entry(self, i, ids):
+        '''Return the LIFT <entry> of entry `i` as a string.'''
+        r = self.random
+        parts = [f'<entry dateCreated="2020-01-01T00:00:00Z" id="{ids[i]}" guid="{i:08d}-0000-4000-8000-000000000000">']
+        parts.append('<lexical-unit>' + self.form('iqu', self.word()) + '</lexical-unit>')
+        if r.random() < 0.3:
+            parts.append('<citation>' + self.form('iqu', self.word()) + '</citation>')
+        morphtype = 'suffix' if r.random() < 0.04 else 'stem'
+        parts.append(f'<trait name="morph-type" value="{morphtype}"/>')
+        if r.random() < 0.15 and i > 0:
+            vartype = r.choice(variant_types)
+            parts.append(
+                f'<relation type="_component-lexeme" ref="{ids[r.randrange(i)]}">'
+                f'<trait name="variant-type" value={quoteattr(vartype)}/></relation>'
+            )
+        if r.random() < 0.1:
+            parts.append('<pronunciation>' + self.form('iqu', self.word()) + '</pronunciation>')
+        for ftype, lang in entry_fields:
+            if r.random() < 0.08:
+                words = words_en if lang == 'en' else words_es
+                parts.append(self.field(ftype, self.form(lang, self.text(words))))
+        for ftype in form_fields:
+            if r.random() < 0.05:
+                parts.append(self.field(ftype, self.form('iqu', self.word())))
+        for ftype in root_fields:
+            if r.random() < 0.05:
+                parts.append(self.field(ftype, self.form('iqu', self.word() + r.choice(['LH', 'HL', 'H']))))
+        for n in range(r.choices([0, 1, 2], [8, 2, 1])[0]):
+            suffix = '' if n == 0 else str(n + 1)
+            parts.append(self.field(
+                f'RelatedForms{suffix}',
+                self.form('iqu', self.word()),
+                self.form('en', self.text(words_en)),
+                self.form('eu', self.text(words_es)),
+            ))
+            parts.append(self.field(f'RelForm {n + 1} POS', self.form('en', r.choice(parts_of_speech))))
+        if r.random() < 0.05:
+            parts.append(self.field('activemiddle', self.form('en', r.choice(['active', 'middle', 'active middle']))))
+        if r.random() < 0.05:
+            history = 'EXCLUDE ' if r.random() < 0.5 else ''
+            parts.append(self.field('Entry History', self.form('es', history + self.text(words_es))))
+        if r.random() < 0.1:
+            parts.append('<note>' + self.form('en', self.text(words_en)) + self.form('eu', self.text(words_es)) + '</note>')
+        for s in range(r.choices([1, 2, 3], [20, 5, 2])[0]):
+            parts.append(self.sense(i, s))
+        parts.append('</entry>\n')
+        return ''.join(parts)
+
+    def sense(self, i, s):
+        '''Return sense `s` of entry `i` as a string.'''
+        r = self.random
+        parts = [f'<sense id="s{i}_{s}" guid="{i:08d}-{s:04d}-4000-8000-000000000001">']
+        parts.append(f'<grammatical-info value={quoteattr(r.choice(parts_of_speech))}/>')
+        for _ in range(r.randint(1, 2)):
+            gloss = self.text(words_es, 3)
+            if r.random() < 0.03:
+                gloss += ' PL: ' + self.word()
+            parts.append('<gloss lang="ga"><text>' + escape(gloss) + '</text></gloss>')
+        parts.append(
+            '<definition>' + self.form('en', self.text(words_en, 8))
+            + self.form('eu', self.text(words_es, 8)) + '</definition>'
+        )
+        for lang, words in (('en', words_en), ('es', words_es), ('eu', words_es)):
+            for _ in range(r.choices([0, 1, 2], [2, 5, 1])[0]):
+                rev = ' '.join(r.choice(words[:-1]) for _ in range(r.randint(1, 3)))
+                parts.append(f'<reversal type="{lang}">' + self.form(lang, rev) + '</reversal>')
+        for ntype in note_types:
+            if r.random() < 0.06:
+                parts.append(
+                    f'<note type="{ntype}">' + self.form('en', self.text(words_en))
+                    + self.form('eu', self.text(words_es)) + '</note>'
+                )
+        if r.random() < 0.04:
+            parts.append(self.field('scientific-name', self.form('en', 'Inga edulis')))
+        if r.random() < 0.05:
+            parts.append(self.field('Poss Pref', self.form('eu', self.word().strip('-=') + '-')))
+        for _ in range(r.choices([0, 1, 2], [5, 3, 1])[0]):
+            parts.append(
+                '<example>' + self.form('iqu', self.word() + ' ' + self.word())
+                + '<translation type="Free translation">'
+                + self.form('en', self.text(words_en, 6)) + self.form('es', self.text(words_es, 6))
+                + '</translation></example>'
+            )
+        parts.append('</sense>')
+        return ''.join(parts)
+
+    def write(self, out, n):
+        '''Write a LIFT document with `n` entries to file object `out`.'''
+        ids = [f'{self.word().strip("-=")}_{i:x}' for i in range(n)]
+        out.write('<?xml version="1.0" encoding="UTF-8" ?>\n')
+        out.write('<lift producer="iquito_dict benchmarks" version="0.13">\n')
+        for i in range(n):
+            out.write(self.entry(i, ids))
+        out.write('</lift>\n')
+
+def write_lift(path, n, seed=1):
+    '''Write a synthetic LIFT file with `n` entries to `path`.'''
+    with open(path, 'w', encoding='utf-8') as out:
+        LiftGenerator(seed).write(out, n)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic LIFT file.')
+    parser.add_argument('entries', type=int, help='number of entries')
+    parser.add_argument('outfile', nargs='?', help='output file (default stdout)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+    if args.outfile is None:
+        LiftGenerator(args.seed).write(sys.stdout, args.entries)
+    else:
+        write_lift(args.outfile, args.entries, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+'''Time each stage of a dictionary build on synthetic LIFT files.
+
+For each size a LIFT file is generated (or reused from `--workdir`) and the
+suite times parsing, extracting the entries, building the LiftIndex and the
+LexiconLookup, looking up every headword, rendering each dictionary target,
+collecting and rendering each reversal target, sorting and writing.
+Each dictionary target is rendered separately, so the timings show which
+renderer falls off first as the lexicon grows.
+
+    python -m benchmarks.suite --sizes 1000 10000 100000
+'''
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+import iquito_dict as iqdict
+from benchmarks.liftgen import write_lift
+
+default_sizes = [1000, 10000, 100000]
+
+@contextlib.contextmanager
+def stage(timings, name, count):
+    '''Add the wall time of the block to `timings` under `name`.'''
+    start = time.perf_counter()
+    yield
+    timings.append((name, time.perf_counter() - start, count))
+
+def run_size(path, workdir):
+    '''Build all targets from the LIFT file at `path` and return a list of
+    (stage, seconds, items) tuples.'''
+    start = time.perf_counter()
+    entries = iqdict.parse_entries(path)
+    timings = [('parse', time.perf_counter() - start, len(entries))]
+    with stage(timings, 'extract', len(entries)):
+        entries = [iqdict.LexEntry(entry) for entry in entries]
+    # Renderers print warnings for bad data; keep them out of the report.
+    with contextlib.redirect_stdout(io.StringIO()):
+        with stage(timings, 'index', len(entries)):
+            index = iqdict.LiftIndex(entries)
+        with stage(timings, 'lookup index', len(entries)):
+            lookup = iqdict.LexiconLookup(entries)
+        with stage(timings, 'lookup exact', len(lookup)):
+            for entry in lookup.entries:
+                lookup.exact(entry.headword)
+        results = {}
+        for t, (render, maps, skip_excluded) in iqdict.dict_targets.items():
+            maps = [getattr(index, m) for m in maps]
+            texentries = results[t] = []
+            with stage(timings, render.__name__, len(entries)):
+                for entry in entries:
+                    if skip_excluded and (iqdict.is_excluded(entry) or iqdict.is_suffix(entry)):
+                        continue
+                    d, err = render(entry, *maps)
+                    if err is None:
+                        texentries.append(d)
+        for t, (render, lang, _) in iqdict.rev_targets.items():
+            with stage(timings, f'collect {lang} reversals', len(entries)):
+                revindex = iqdict.ReversalIndex([t], entries)
+                revindex.sort(t)
+            texentries = results[t] = []
+            with stage(timings, render.__name__ + f' ({lang})', revindex.count(t)):
+                for rev, e in revindex.items(t):
+                    d, err = render(rev, e)
+                    if err is None:
+                        texentries.append(d)
+    count = sum(len(texentries) for texentries in results.values())
+    with stage(timings, 'sort', count):
+        for texentries in results.values():
+            texentries.sort(key=iqdict.sortword_key)
+    outfiles = {
+        t: os.path.join(workdir, f'bench_{t}.tex') for t in iqdict.dict_targets
+    }
+    with stage(timings, 'write', count):
+        iqdict.write_dictionaries(results, outfiles)
+    return timings
+
+def report(size, timings):
+    '''Print the timings of one size as a table.'''
+    print(f'\n{size} entries')
+    print(f'  {"stage":36s} {"seconds":>9s} {"items/s":>11s}')
+    for name, secs, count in timings:
+        rate = count / secs if secs > 0 else float('inf')
+        print(f'  {name:36s} {secs:9.3f} {rate:11.0f}')
+    print(f'  {"total":36s} {sum(t[1] for t in timings):9.3f}')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the stages of a dictionary build.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=default_sizes,
+                        help='numbers of entries to benchmark')
+    parser.add_argument('--workdir', help='directory for generated files (default: temporary)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the timings to this file')
+    args = parser.parse_args(argv)
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir
+        if workdir is None:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(workdir, exist_ok=True)
+        alltimings = {}
+        for size in args.sizes:
+            path = os.path.join(workdir, f'synthetic_{size}_{args.seed}.lift')
+            if not os.path.exists(path):
+                write_lift(path, size, args.seed)
+            timings = run_size(path, workdir)
+            report(size, timings)
+            alltimings[size] = [
+                {'stage': name, 'seconds': secs, 'items': count}
+                for name, secs, count in timings
+            ]
+    if args.json is not None:
+        with open(args.json, 'w', encoding='utf-8') as out:
+            json.dump(alltimings, out, indent=1)
+
+if __name__ == '__main__':
+    main()
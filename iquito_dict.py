@@ -1,8 +1,30 @@
+import argparse
+import bisect
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import os
+import pickle
+import queue
 import re
+import sqlite3
+import string
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
 
-# Storage for word counts
-wordcounts = { }
-revwordcounts = { }
 
 glossmap = {
     'Raíz:': r'\textit{Raíz:}',
@@ -123,6 +145,49 @@ order_varlab_acad_es = [
     'persvarlabunk'
 ]
 
+# Map LIFT variant types to latex label macros.
+varmap = {
+    'Sociolinguistic variant': 'sociovarlab',
+    'Free variant': 'freevarlab', # TODO: for Lev to review
+    'Free Variant': 'freevarlab',
+    'Dialectal variant': 'dialectvarlab', # TODO: for Lev to review
+    'Dialectal variant of': 'dialectvaroflab',
+    'Quantificational variant': 'quantvarlab', # TODO: for Lev to review
+    'Archaic variant': 'archvarlab', # TODO: for Lev to review
+    'Nanay dialect': 'dialectlabNanay',
+    'Chambira dialect': 'dialectlabChambira',
+    'Maasikuuri dialect': 'dialectlabMaasikuuri',
+    'Iíjakawɨɨ́raana dialect': 'dialectlabIíjakawɨɨ́raana', # TODO: for Lev to review
+    'Inkawɨ́ɨ́rààna dialect': 'dialectlabInkawɨɨ́raana', # TODO: for Lev to review
+    'Inkawɨɨ́raana dialect': 'dialectlabInkawɨɨ́raana',
+    'Majanakáani dialect': 'dialectlabMajanakáani', # TODO: for Lev to review
+    'Máájànàkáànì dialect': 'dialectlabMajanakáani', # TODO: for Lev to review
+    'Maájanakáani dialect': 'dialectlabMaájanakáani',
+    'Maásikuuri dialect': 'dialectlabMaásikuuri', # TODO: for Lev to review
+    'Personal variant (JPI)': 'persvarlabJPI',
+    'Personal variant (ELY)': 'persvarlabELY',
+    'Personal variant (HDC)': 'persvarlabHDC',
+    'Personal variant': 'persvarlabunk',
+    'Constructional variant': 'constructvarlab',
+    'Archaic variant of': 'archvarlab',
+    'Prepausal form': 'prepausallab',
+    'Affective variant': 'affectvarlab',
+    'Euphemistic variant': 'euphvarlab',
+    'Playful variant': 'playvarlab',
+    'Irregular 3rd person possessed form': 'irregthirdposs',
+    'Irregular 1st person possessed form': 'irregfirstposs',
+    'Nickname': 'nicknamelab',
+    'Allomorph': 'allomorphlab',
+    'Irregular plural': 'irregpllab',  # Not converted to latex macro here; handled separately
+    'Irregular Plural': 'irregpllab',  # TODO: for Lev to review
+    'Imperfective root': 'impfrtlab',
+}
+#    'Free variant(s)': 'freevarlabs',
+#    'Dialectal variant(s)': 'dialectvarlabs',
+
+# Readable name of each variant label: the first variant type that maps to it.
+varnames = {label: vartype for vartype, label in reversed(varmap.items())}
+
 # Ordered list of (single byte) characters in the alphabet.
 # Ɨ is a single-byte placeholder for ɨ́, which is a sequence of two characters (vowel+diacritic).
 #alphabet = ' øáabcdéefghíiƗɨjklmnóopqrstúuvwxyz'
@@ -132,67 +197,157 @@ alphabet = ' øaAbcdeEfghiIɨƗjklmnoOpqrstuUvwxyz'
 # Map characters to position in the alphabet.
 amap = {c: alphabet.index(c) for c in alphabet}
 
+# Remove tex commands and keep their argument.
+texcmd_re = re.compile(r'\\\w+{([^}]+)}')
+
+# Punctuation and morpheme markers do not affect sorting.
+alpha_delete = str.maketrans('', '', '"“”¿?=-#')
+
+def _vowel_folds():
+    '''Return a dict mapping each written form of a vowel (with or without a
+    precomposed or combining tone diacritic) to the plain vowel, and each pair
+    of forms of the same vowel to the long vowel character of `alphabet`.'''
+    precomposed = {'a': 'áà', 'e': 'éè', 'i': 'íì', 'o': 'óò', 'u': 'úù'}
+    folds = {}
+    for long in [c for c in alphabet if c != c.lower()]:
+        v = long.lower()
+        forms = [v, v + '\u0301', v + '\u0300'] + list(precomposed.get(v, ''))
+        if v == 'ɨ':
+            # ɨ́ and ɨ̀ don't have precomposed forms and are stripped one after
+            # the other, so ɨ́̀ loses both diacritics.
+            forms.append(v + '\u0301\u0300')
+        for f in forms[1:]:
+            folds[f] = v
+        for f1 in forms:
+            for f2 in forms:
+                folds[f1 + f2] = long
+    return folds
+
+vowel_folds = _vowel_folds()
+# Longest alternatives first so that a vowel+diacritic sequence is never split.
+vowel_fold_re = re.compile(
+    '|'.join([re.escape(f) for f in sorted(vowel_folds, key=len, reverse=True)])
+)
+
+def _fold_vowel(m):
+    return vowel_folds[m.group()]
+
+# The expansion of each long vowel character in `alphabet`.
+longvowels = {c: c.lower() * 2 for c in alphabet if c != c.lower()}
+
 def str2alpha(s):
     '''Convert characters in s to conventionalized set of alphabetic characters.
     Diacritics are stripped out and long vowels are replaced by upper case characters.
     All other characters are lower case.
     '''
+    return sortkey(s).alpha
+
+def _str2alpha(s):
+    '''Compiled single-pass implementation of str2alpha.'''
     # Canonicalize to lower case.
     s = s.strip().lower()
-    
-    # Remove tex commands.
-    s = re.sub(r'\\\w+{([^}]+)}', r'\1', s)
-
-    # Remove punctuation.
-    s = s.replace('"', '') \
-         .replace('“', '').replace('”', '') \
-         .replace('¿', '').replace('?', '')
-
-    # Morpheme markers do not affect sorting. Remove them.
-    s = s.replace('=', '').replace('-', '').replace('#', '')
-
-    # Replace diacritic digraphs (i.e. vowel+diacritic combinations) with precomposed characters.
-    # (ɨ́ and ɨ̀ don't have precomposed forms.)
-    s = s.replace('á', 'á').replace('é', 'é').replace('í', 'í') \
-         .replace('ó', 'ó').replace('ú', 'ú') \
-         .replace('à', 'à').replace('è', 'è').replace('ì', 'ì') \
-         .replace('ò', 'ò').replace('ù', 'ù')
-
-    # Ignore diacritics by replacing with unmodified character.
-    s = s.replace('á', 'a').replace('é', 'e').replace('í', 'i') \
-         .replace('ɨ́', 'ɨ').replace('ó', 'o').replace('ú', 'u') \
-         .replace('à', 'a').replace('è', 'e').replace('ì', 'i') \
-         .replace('ɨ̀', 'ɨ').replace('ò', 'o').replace('ù', 'u')
-
-    # Replace long vowel sequences with single upper case.
-    s = s.replace('aa', 'A').replace('ee', 'E').replace('ii', 'I') \
-         .replace('ɨɨ', 'Ɨ').replace('oo', 'O').replace('uu', 'U')
-
-    # Clean up bad character data.
-    s = cleanstr(s)
+    if '\\' in s:
+        s = texcmd_re.sub(r'\1', s)
+    # Remove punctuation and morpheme markers, then fold diacritics and long
+    # vowels in one scan.
+    return vowel_fold_re.sub(_fold_vowel, s.translate(alpha_delete))
 
-    return s
+SortKey = collections.namedtuple('SortKey', ['alpha', 'sort', 'letter'])
+
+@functools.lru_cache(maxsize=65536)
+def sortkey(s):
+    '''Return a SortKey for s, holding its str2alpha form, its str2sort key and
+    its chapter letter as returned by firstletter. `sort` is None if s has
+    characters that are not in the alphabet and `letter` is None if s is empty
+    after normalization. Keys are memoized in an LRU cache.'''
+    alpha = _str2alpha(s)
+    try:
+        # All positions in the alphabet are ascii, so the bytes are already
+        # an ascii string.
+        sort = bytes([amap[c] for c in alpha])
+    except KeyError:
+        sort = None
+    letter = longvowels.get(alpha[0], alpha[0]) if alpha != '' else None
+    return SortKey(alpha, sort, letter)
 
 def str2sort(s):
     '''Convert characters in s to set of ordered codepoints and return as an ascii string.'''
-    
-    # Map characters to ordered codepoints.
-    s = str2alpha(s)
-    sortnum = [amap[c] for c in s]
+    sort = sortkey(s).sort
+    if sort is None:
+        # Raise KeyError for the first character that is not in the alphabet.
+        [amap[c] for c in sortkey(s).alpha]
+    return sort
+
+def str2sort_many(strs):
+    '''Return the sort keys of the strings in `strs` as a list. Keys of strings
+    already seen are taken from the sortkey cache.'''
+    return list(map(str2sort, strs))
 
-    # Return as an ascii string.
-# TODO: can this be simplified?
-    return (bytes(sortnum).decode('ascii')).encode('ascii')
+# Spell out the long vowel characters of str2alpha, so that a short vowel at
+# the end of a lookup prefix also matches the long vowel.
+longvowel_expand = str.maketrans(longvowels)
+
+def lookup_key(s):
+    '''Return the key of s in a LexiconLookup: its str2alpha form with long
+    vowels spelled out as two vowels, so tone marks, punctuation and morpheme
+    markers are ignored.'''
+    return sortkey(s).alpha.translate(longvowel_expand)
 
 def firstletter(s):
     '''Return first alphabetic letter of s.'''
-    first = str2alpha(s)[0]
-    first = first.replace('A', 'aa').replace('E', 'ee').replace('I', 'ii') \
-                 .replace('Ɨ', 'ɨɨ').replace('O', 'oo').replace('U', 'uu')
-    return first
+    letter = sortkey(s).letter
+    if letter is None:
+        raise IndexError('string index out of range')
+    return letter
+
+# First alphabetic character of a reversal sortword.
+revletter_re = re.compile(r'[^\W\d_]')
+
+class RevCollator(object):
+    '''Compiled collation rules for reversal headwords: strip whitespace and the
+    tex markup in `strip` (or any tex command if `strip_texcmds` is True), convert
+    to upper case and apply the `replace` mapping in one translate.'''
+    def __init__(self, replace, strip=(), strip_texcmds=False):
+        self.strip = tuple(strip)
+        self.strip_texcmds = strip_texcmds
+        self.table = str.maketrans(replace)
+
+    def key(self, rev):
+        '''Return the sortword and chapter letter of rev. The letter is None if
+        the sortword has no alphabetic character.'''
+        s = rev.strip()
+        if '\\' in s:
+            if self.strip_texcmds is True:
+                s = texcmd_re.sub(r'\1', s)
+            for t in self.strip:
+                s = s.replace(t, '')
+        sortword = s.upper().translate(self.table)
+        m = revletter_re.search(sortword)
+        return (sortword, None if m is None else m.group())
+
+    def keys(self, revs):
+        '''Return the (sortword, letter) keys of all reversals in `revs`.'''
+        key = self.key
+        return [key(rev) for rev in revs]
+
+# Replacements shared by the reversal collation rules.
+revreplace = {
+    'Á': 'A', 'É': 'E', 'Í': 'I', 'Ó': 'O', 'Ú': 'U', 'Ñ': 'N', 'ñ': 'n',
+    '-': '', '=': '', '“': '', '”': '', '"': '', '`': '', '¡': '', '{': '', '}': '',
+}
+
+# Reversals of the academic dictionary and diccionario escolar.
+revcollator_acad = RevCollator(revreplace, strip=(r'\sci ', r'\sp '))
+
+# Reversals of the Spanish-language academic dictionary.
+revcollator_acad_es = RevCollator(
+    dict(revreplace, **{'¿': '', '?': ''}), strip_texcmds=True
+)
 
 def cleanstr(s):
     '''Clean up bad character data in a string and return cleaned string.'''
+    if '\u0301' not in s and '\u0081' not in s:
+        return s
     # Remove extraneous combining acute accent that follows precomposed character with acute accent.
     for c in 'áéíóú':
         # Replaces b'\xcc\x81' (U+0301).
@@ -211,7 +366,12 @@ def cleantex(s):
         
 def nodetext(node):
     '''Return all text found in node as a string.'''
-    return cleantex(''.join(list(node.itertext())))
+    text = node.text
+    if len(node) > 0:
+        text = ''.join(node.itertext())
+    elif text is None:
+        text = ''
+    return cleantex(text)
 
 def superscriptLH(s):
     '''Replace L/H with tex superscript form.'''
@@ -222,9 +382,64 @@ def activemiddle_replace_es(s):
     '''Translate activemiddle field to Spanish.'''
     return s.replace('active', 'activo').replace('middle', 'medio')
 
+def parse_entries(source):
+    '''Parse a LIFT file and return the list of its <entry> elements.'''
+    return ET.parse(source).getroot().findall('entry')
+
+def iterentries(source, tag='entry', clear=True):
+    '''Yield the <entry> elements of a LIFT file one at a time as they are parsed.
+    Each entry is cleared and detached from the root after it is yielded, unless
+    `clear` is False.'''
+    context = ET.iterparse(source, events=('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event == 'end' and elem.tag == tag:
+            yield elem
+            if clear is True:
+                elem.clear()
+                root.remove(elem)
+
+# XML backend of serialized_entries(): 'lxml' if it is installed, else
+# 'etree' (xml.etree.ElementTree). Change it with use_backend().
+xml_backend = 'etree' if lxml_etree is None else 'lxml'
+
+def use_backend(name):
+    '''Serialize entries with backend `name`, 'lxml' or 'etree'.'''
+    global xml_backend
+    if name not in ('lxml', 'etree'):
+        raise ValueError(f'Unknown XML backend {name}')
+    if name == 'lxml' and lxml_etree is None:
+        raise ImportError('The lxml backend requires lxml to be installed')
+    xml_backend = name
+
+def serialized_entries(source, backend=None):
+    '''Yield the guid and the serialized element of each <entry> of a LIFT
+    file, without the whitespace after it. With the lxml backend this is
+    several times faster; either way the entries are extracted from the bytes
+    with ElementTree, so the backend doesn't change the output.'''
+    if backend is None:
+        backend = xml_backend
+    if backend == 'lxml':
+        context = lxml_etree.iterparse(
+            source, tag='entry', remove_comments=True, remove_pis=True
+        )
+        for _, node in context:
+            yield node.get('guid'), lxml_etree.tostring(node, with_tail=False)
+            node.clear()
+            while node.getprevious() is not None:
+                del node.getparent()[0]
+    else:
+        for node in iterentries(source):
+            node.tail = None
+            yield node.get('guid'), ET.tostring(node)
+
 def get_headword(entry):
     '''Return an entry's headword. Throw an error if entry's headword fields are missing
     or empty.'''
+    if isinstance(entry, LexEntry):
+        if entry.headword is None:
+            raise AttributeError(f'Missing headword in entry {entry.guid}')
+        return entry.headword
     try:
         hdwd = nodetext(entry.find('citation/form[@lang="iqu"]/text')).strip()
         assert(hdwd is not None)
@@ -233,34 +448,52 @@ def get_headword(entry):
         assert(hdwd is not None)
     return hdwd
 
-def add_wc(s, letter, rev=False):
-    '''Add wordcount in `s` to chapter total in `wordcounts` global variable.'''
-    #if letter is None:
-    #    print(f'{s} has no letter')
-    s = re.sub(r'{\\(sp|iqt) [^}]*}', '', s)  # Remove \sp|\iqt text
-    words = [w for w in s.split() if re.search('\w', w) is not None]
-    wc = len(words)
-    if rev is False:
-        try:
-            wordcounts[letter] += wc
-        except KeyError:
-            wordcounts[letter] = wc
-    else:
+class WordCounter(dict):
+    '''Word counts by chapter letter, one for each target of a build.'''
+    skip_re = re.compile(r'{\\(sp|iqt) [^}]*}')  # \sp|\iqt text is not counted
+    word_re = re.compile(r'\w')
+
+    def add(self, s, letter):
+        '''Add wordcount in `s` to chapter total of `letter`.'''
+        s = self.skip_re.sub('', s)
+        wc = 0
+        for w in s.split():
+            if self.word_re.search(w) is not None:
+                wc += 1
         try:
-            revwordcounts[letter] += wc
+            self[letter] += wc
         except KeyError:
-            revwordcounts[letter] = wc
+            self[letter] = wc
+
+    def merge(self, other):
+        '''Add the chapter totals of `other` to this counter.'''
+        for letter, wc in other.items():
+            try:
+                self[letter] += wc
+            except KeyError:
+                self[letter] = wc
+        return self
 
-def reset_wordcounts():
-    '''Reset the global `wordcounts` variable.'''
-    wordcounts = {}
+    def report(self, title='Word counts'):
+        '''Return the chapter totals and their sum as a table.'''
+        lines = [title]
+        for letter in sorted(self, key=str):
+            lines.append(f'{letter}\t{self[letter]}')
+        lines.append(f'Total\t{sum(self.values())}')
+        return '\n'.join(lines) + '\n'
 
-def reset_revwordcounts():
-    '''Reset the global `revwordcounts` variable.'''
-    revwordcounts = {}
+def add_wc(s, letter, counter=None):
+    '''Add wordcount in `s` to chapter total in WordCounter `counter`, if
+    one is given.'''
+    #if letter is None:
+    #    print(f'{s} has no letter')
+    if counter is not None:
+        counter.add(s, letter)
 
 def is_excluded(entry):
     '''Return True if entry is annotated for exclusion.'''
+    if isinstance(entry, LexEntry):
+        return entry.excluded
     is_exc = False
     try:
         ehist = ''.join(
@@ -274,42 +507,323 @@ def is_excluded(entry):
 
 def is_suffix(entry):
     '''Return True if entry type is suffix.'''
+    if isinstance(entry, LexEntry):
+        return entry.suffix
     return entry.find('trait[@name="morph-type"][@value="suffix"]') is not None
 
-def lexeme2tex(entry, do_superscriptLH=False):
+class TexEmitter(object):
+    '''Buffer for the tex of one entry. Renderers write their pieces into it,
+    nested renderers write into the buffer of their caller, and the text is
+    joined once with getvalue().'''
+    __slots__ = ('parts', 'write')
+
+    def __init__(self):
+        self.parts = []
+        self.write = self.parts.append
+
+    def getvalue(self):
+        return ''.join(self.parts)
+
+# Wildcard for an attribute that is not constrained in a field XPath.
+field_any = '*'
+
+field_xpath_re = re.compile(
+    r'(?:([\w-]+)(?:\[@type="([^"]*)"\])?/)?form(?:\[@lang="([^"]*)"\])?/text'
+)
+
+@functools.lru_cache(maxsize=None)
+def field_key(xpath):
+    '''Return the (tag, type, lang) key of a FieldTable for a field XPath of
+    the form `tag[@type="..."]/form[@lang="..."]/text`, with `field_any` for
+    the attributes not given in the XPath, or None for any other XPath. The
+    tag and type of a `form` child of the node itself are None.'''
+    m = field_xpath_re.fullmatch(xpath)
+    if m is None:
+        return None
+    tag, ftype, lang = m.groups()
+    if lang is None:
+        lang = field_any
+    if tag is None:
+        return (None, None, lang)
+    return (tag, field_any if ftype is None else ftype, lang)
+
+def _intern(s):
+    '''Intern an attribute value that repeats across entries.'''
+    return s if s is None else sys.intern(s)
+
+class FieldTable(object):
+    '''Text fields of a node, collected in a single walk over its children and
+    stored by (tag, type, lang). `get()` accepts the XPaths of field_key().'''
+    __slots__ = ('texts',)
+
+    def __init__(self, node):
+        self.texts = {}
+        for child in node:
+            tag = child.tag
+            if tag == 'form':
+                text = child.find('text')
+                if text is not None:
+                    self._add(None, None, child.get('lang'), text)
+                continue
+            ftype = child.get('type')
+            for form in child.findall('form'):
+                text = form.find('text')
+                if text is not None:
+                    self._add(tag, ftype, form.get('lang'), text)
+
+    @classmethod
+    def from_fields(cls, fields):
+        '''Return a table of the (tag, type, lang, text) `fields`, as returned
+        by fields().'''
+        table = cls.__new__(cls)
+        table.texts = {}
+        for tag, ftype, lang, text in fields:
+            table._put(tag, ftype, lang, text)
+        return table
+
+    def _add(self, tag, ftype, lang, text):
+        if (tag, ftype, lang) not in self.texts:
+            self._put(tag, ftype, lang, nodetext(text))
+
+    def _put(self, tag, ftype, lang, text):
+        texts = self.texts
+        key = (tag, _intern(ftype), _intern(lang))
+        if key in texts:
+            return
+        texts[key] = text
+        texts.setdefault((tag, key[1], field_any), text)
+        if tag is not None:
+            texts.setdefault((tag, field_any, key[2]), text)
+            texts.setdefault((tag, field_any, field_any), text)
+
+    def fields(self):
+        '''Return the (tag, type, lang, text) tuples of the fields in the
+        order they were found, without the wildcard keys.'''
+        return [key + (text,) for key, text in self.texts.items() if field_any not in key]
+
+    def __repr__(self):
+        return f'FieldTable({self.texts!r})'
+
+    def get(self, xpath):
+        '''Return the text of a field, or None if it is missing.'''
+        key = field_key(xpath)
+        if key is None:
+            raise ValueError(f'Unsupported field XPath {xpath}')
+        return self.texts.get(key)
+
+class LexObject(object):
+    '''Base of the classes of an extracted entry. The repr shows all slots,
+    so it also serves as a stable serialization for digests.'''
+    __slots__ = ()
+
+    @classmethod
+    def from_values(cls, *values):
+        '''Return an object with the slot values `values`, in the order of
+        __slots__, e.g. to rebuild it from the rows of a LexiconStore.'''
+        obj = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, values):
+            setattr(obj, name, value)
+        return obj
+
+    def __repr__(self):
+        values = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({values})'
+
+class LexExample(LexObject):
+    '''An example of a sense: the Iquito text and its free translations by
+    lang, or None if the Iquito text is missing.'''
+    __slots__ = ('iqu', 'translations')
+
+    def __init__(self, node):
+        text = node.find('form[@lang="iqu"]/text')
+        self.iqu = None if text is None else nodetext(text)
+        self.translations = {}
+        for form in node.findall('translation[@type="Free translation"]/form'):
+            text = form.find('text')
+            lang = form.get('lang')
+            if text is not None and lang not in self.translations:
+                self.translations[_intern(lang)] = nodetext(text)
+
+class LexRelForm(LexObject):
+    '''A related form: its forms by lang and the root and part of speech the
+    entry gives for its RelatedForms field, or 'MISSING'.'''
+    __slots__ = ('forms', 'root', 'pos')
+
+    def __init__(self, node, root='MISSING', pos='MISSING'):
+        self.forms = {}
+        for form in node.findall('form'):
+            text = form.find('text')
+            lang = form.get('lang')
+            if text is not None and lang not in self.forms:
+                self.forms[_intern(lang)] = ''.join(text.itertext())
+        self.root = root
+        self.pos = pos
+
+class LexSense(LexObject):
+    '''The fields of a <sense> that the renderers and reversal collectors use.'''
+    __slots__ = ('id', 'guid', 'pos', 'definitions', 'fields', 'examples', 'reversals')
+
+    def __init__(self, node):
+        self.id = node.get('id')
+        self.guid = node.get('guid')
+        ginfo = node.find('grammatical-info')
+        self.pos = None if ginfo is None else sys.intern(ginfo.attrib['value'].strip())
+        self.definitions = {}
+        for form in node.findall('definition/form'):
+            defs = [''.join(text.itertext()).strip() for text in form.findall('text')]
+            try:
+                self.definitions[form.get('lang')] += defs
+            except KeyError:
+                self.definitions[_intern(form.get('lang'))] = defs
+        self.fields = FieldTable(node)
+        self.examples = [LexExample(ex) for ex in node.findall('example')]
+        self.reversals = {}
+        for rev in node.findall('reversal'):
+            texts = tuple(nodetext(text) for text in rev.findall('form/text'))
+            try:
+                self.reversals[rev.get('type')].append(texts)
+            except KeyError:
+                self.reversals[_intern(rev.get('type'))] = [texts]
+
+class LexEntry(LexObject):
+    '''Compact, picklable representation of an <entry>, extracted from the tree
+    once, with everything the renderers and the LiftIndex look up.'''
+    __slots__ = (
+        'id', 'guid', 'headword', 'varform', 'pos', 'excluded', 'suffix',
+        'fields', 'glosses', 'senses', 'relforms', 'relations',
+    )
+
+    def __init__(self, node):
+        self.id = node.get('id')
+        self.guid = node.get('guid')
+        try:
+            self.headword = get_headword(node)
+        except AttributeError:
+            self.headword = None
+        self.excluded = is_excluded(node)
+        self.suffix = is_suffix(node)
+        self.fields = FieldTable(node)
+        self.senses = [LexSense(s) for s in node.findall('sense')]
+        self.pos = None
+        for s in self.senses:
+            if s.pos is not None:
+                self.pos = s.pos
+                break
+        self.glosses = [nodetext(g) for g in node.findall('sense/gloss[@lang="ga"]/text')]
+        self.relforms = []
+        for suffix in ['', '2', '3', '4', '5']:
+            relforms = node.findall(f'field[@type="RelatedForms{suffix}"]')
+            if len(relforms) == 0:
+                continue
+            n = '1' if suffix == '' else suffix
+            extra = []
+            for ident, lg in [('root', 'iqu'), ('POS', 'en')]:
+                text = node.find(f'field[@type="RelForm {n} {ident}"]/form[@lang="{lg}"]/text')
+                extra.append('MISSING' if text is None else ''.join(text.itertext()))
+            self.relforms.append([LexRelForm(rf, *extra) for rf in relforms])
+        self.relations = []
+        self.varform = None
+        relations = node.findall('relation[@type="_component-lexeme"]')
+        if len(relations) > 0:
+            try:  # citation form if it exists, else lexeme form
+                self.varform = node.find('citation/form[@lang="iqu"]/text').text
+            except AttributeError:
+                self.varform = node.find('lexical-unit/form[@lang="iqu"]/text').text
+            for rel in relations:
+                try:
+                    vartype = rel.find('trait[@name="variant-type"]').attrib['value']
+                except (AttributeError, KeyError):
+                    vartype = None
+                self.relations.append((rel.attrib['ref'], vartype))
+
+def lexentry(entry):
+    '''Return entry as a LexEntry, extracting it if it is an <entry> node.'''
+    if isinstance(entry, LexEntry):
+        return entry
+    return LexEntry(entry)
+
+# Fields written for each sense, as (tex command, XPath) pairs.
+sense_fields_en = [
+    ('scientificname', 'field[@type="scientific-name"]/form[@lang="en"]/text'),
+    ('anthronote', 'note[@type="anthropology"]/form[@lang="en"]/text'),
+    ('semnote', 'note[@type="semantics"]/form[@lang="en"]/text'),
+    ('grammarnote', 'note[@type="grammar"]/form[@lang="en"]/text'),
+    ('socionote', 'note[@type="sociolinguistics"]/form[@lang="en"]/text'),
+    ('discoursenote', 'note[@type="discourse"]/form[@lang="en"]/text'),
+]
+
+sense_fields_es = [
+    ('scientificname', 'field[@type="scientific-name"]/form[@lang="en"]/text'),
+    ('anthronote', 'note[@type="anthropology"]/form[@lang="eu"]/text'),
+    ('semnote', 'note[@type="semantics"]/form[@lang="eu"]/text'),
+    ('grammarnote', 'note[@type="grammar"]/form[@lang="eu"]/text'),
+    ('posspref', 'field[@type="Poss Pref"]/form[@lang="eu"]/text'),
+    ('socionote', 'note[@type="sociolinguistics"]/form[@lang="eu"]/text'),
+    ('discoursenote', 'note[@type="discourse"]/form[@lang="eu"]/text'),
+]
+
+# Entry fields of the Spanish-language academic dictionary in order, as
+# (tex command, XPath, superscript L/H) tuples. The fields without an XPath
+# are written from the lexical unit and from the variant map.
+entry_fields_acad_es = [
+    ('litmean', 'field[@type="literal-meaning"]/form[@lang="eu"]/text', False),
+    ('note', 'note/form[@lang="eu"]/text', False),
+    ('anthnoteentry', 'field[@type="Entry Anthro"]/form[@lang="eu"]/text', False),
+    ('semnoteentry', 'field[@type="Entry Semantics"]/form[@lang="eu"]/text', False),
+    ('gramnoteentry', 'field[@type="Entry Grammar"]/form[@lang="eu"]/text', False),
+    ('socionoteentry', 'field[@type="Entry Socioling"]/form[@lang="eu"]/text', False),
+    ('lexeme', None, True),
+    ('derivroot', 'field[@type="Deriv Root"]/form/text', True),
+    ('irregpl', 'field[@type="Irreg Pl"]/form/text', False),
+    ('irregposs', 'field[@type="Irreg Poss"]/form/text', False),
+    ('irregposspl', 'field[@type="Irreg Poss Pl"]/form[@lang="iqu"]/text', False),
+    ('irregfirstposs', None, False),
+    ('irregthirdposs', None, False),
+    ('altpronuncnote', 'field[@type="Alternate Pronunciation"]/form[@lang="eu"]/text', False),
+    ('altpronunc', 'field[@type="Alternate Pronunciation"]/form[@lang="iqu"]/text', True),
+]
+
+def fields2tex(fields, schema, level=1, letter=None, out=None, counter=None):
+    '''Write the fields of `schema` found in FieldTable `fields`.'''
+    tex = TexEmitter() if out is None else out
+    for texfld, xpath in schema:
+        simplefield2tex(fields, texfld, xpath, level=level, letter=letter, out=tex, counter=counter)
+    if out is None:
+        return tex.getvalue()
+
+def lexeme2tex(entry, do_superscriptLH=False, out=None):
     '''Return the formatted Lexeme Form if the Lexeme Form is not also the
     headword (i.e. if the Citation Form exists and is used as the headword.'''
-    tex = ''
-    if entry.find('citation/form[@lang="iqu"]/text') is not None:
+    tex = TexEmitter() if out is None else out
+    if entry.fields.get('citation/form[@lang="iqu"]/text') is not None:
         try:
-            tex = simplefield2tex(
-                entry, 'lexeme', 'lexical-unit/form[@lang="iqu"]/text', level=1,
-                do_superscriptLH=do_superscriptLH
+            simplefield2tex(
+                entry.fields, 'lexeme', 'lexical-unit/form[@lang="iqu"]/text', level=1,
+                do_superscriptLH=do_superscriptLH, out=tex
             )
 
         except:
             pass
-    return tex
+    if out is None:
+        return tex.getvalue()
 
 # This function added later for sense-specific POS for verbs.
 def get_first_pos(e):
-    '''Get the part of speech of the first sense in an entry.'''
-    try:
-        return e.find('sense/grammatical-info').attrib['value'].strip()
-    except AttributeError:
+    '''Get the part of speech of the first sense in LexEntry e.'''
+    if e.pos is None:
         print('WARNING: Could not find part-of-speech (sense/grammatical-info) ' \
-              'for entry guid {:}'.format(e.attrib['guid'])
+              'for entry guid {:}'.format(e.guid)
         )
         return ''
+    return e.pos
 
 # This function added later for sense-specific POS for verbs.
-def sense_pos2tex(s, lang="en"):
-    tex = ''
-    try:
-        ginfo = s.find('grammatical-info').attrib['value'].strip()
-    except AttributeError:
+def sense_pos2tex(s, lang="en", out=None):
+    tex = TexEmitter() if out is None else out
+    ginfo = s.pos
+    if ginfo is None:
         print('WARNING: Could not find part-of-speech (sense/grammatical-info) ' \
-              'for sense guid {:}'.format(s.attrib['guid'])
+              'for sense guid {:}'.format(s.guid)
         )
         ginfo = ''
     if lang == "es":
@@ -322,18 +836,13 @@ def sense_pos2tex(s, lang="en"):
             ginfo = posmap_en[ginfo]
         except (KeyError, AttributeError):
             pass
-    tex += r'  \pos{' + ginfo + '}'
-    return tex
+    tex.write(r'  \pos{' + ginfo + '}')
+    if out is None:
+        return tex.getvalue()
 
-def pos2tex(e, lang="en"):
-    tex = ''
-    try:
-        ginfo = e.find('sense/grammatical-info').attrib['value'].strip()
-    except AttributeError:
-        print('WARNING: Could not find part-of-speech (sense/grammatical-info) ' \
-              'for entry guid {:}'.format(e.attrib['guid'])
-        )
-        ginfo = ''
+def pos2tex(e, lang="en", out=None):
+    tex = TexEmitter() if out is None else out
+    ginfo = get_first_pos(e)
     if lang == "es":
         try:
             ginfo = posmap_es[ginfo]
@@ -344,57 +853,49 @@ def pos2tex(e, lang="en"):
             ginfo = posmap_en[ginfo]
         except (KeyError, AttributeError):
             pass
-    tex += '\n' + r'  \pos{' + ginfo + '}'
-    return tex
+    tex.write('\n' + r'  \pos{' + ginfo + '}')
+    if out is None:
+        return tex.getvalue()
 
 def get_irreg_pl(glosses):
     irreg_pl = []
     for gloss in glosses:
         try:
-            irreg_pl += [g.strip() for g in nodetext(gloss).split('PL:')[1].split(',')]
+            irreg_pl += [g.strip() for g in gloss.split('PL:')[1].split(',')]
         except IndexError:
             pass
     return irreg_pl
     
-def glosses2tex(glosses):
-    tex = '\n  \\begin{itemize}[leftmargin=3.5em]'
+def glosses2tex(glosses, out=None):
+    tex = TexEmitter() if out is None else out
+    tex.write('\n  \\begin{itemize}[leftmargin=3.5em]')
     for idx, gloss in enumerate(glosses):
-        gloss = nodetext(gloss)
         for orig, repl in glossmap.items():
             gloss = gloss.replace(orig, repl)
         # TODO: doesn't seem to be necessary to check length anymore
         if len(glosses) > 1:
 #            tex += r'  \item{\gloss{' + str(idx+1) + '. ' + nodetext(gloss) + '}}\n'
-            tex += '\n' + r'    \item{\gloss{' + gloss + '}}'
+            tex.write('\n' + r'    \item{\gloss{' + gloss + '}}')
         else:
-            tex += '\n' + r'    \item{\gloss{' + gloss + '}}'
-    return (tex + '\n  \end{itemize}')
+            tex.write('\n' + r'    \item{\gloss{' + gloss + '}}')
+    tex.write('\n  \end{itemize}')
+    if out is None:
+        return tex.getvalue()
 
-def senses2tex(entry, sense_pos, letter):
+def senses2tex(entry, sense_pos, letter, out=None, counter=None):
     '''Return senses in latex format.'''
-    tex = ''
-    senses = entry.findall('sense')
+    tex = TexEmitter() if out is None else out
+    senses = entry.senses
     for idx, s in enumerate(senses):
-        tex += '  \\sense{'
+        tex.write('  \\sense{')
         if len(senses) > 1:
-            tex += r'\textbf{' + '{:d}'.format(idx + 1) + '.} '
-        tex += '\n'
+            tex.write(r'\textbf{' + '{:d}'.format(idx + 1) + '.} ')
+        tex.write('\n')
         if sense_pos is True:
-            tex += sense_pos2tex(s)
-        try:
-            definitions = s.findall('definition/form[@lang="en"]/text')
-            for definition in definitions:
-                defn =  ''.join(definition.itertext()).strip()
-                tex += '    \\definition{' + defn + '}'
-                add_wc(defn, letter)  # Add wordcounts
-        except (AttributeError, TypeError):
-            pass
-        tex += simplefield2tex(
-            s,
-            'scientificname',
-            'field[@type="scientific-name"]/form[@lang="en"]/text',
-            level=2
-        )
+            sense_pos2tex(s, out=tex)
+        for defn in s.definitions.get('en', ()):
+            tex.write('    \\definition{' + defn + '}')
+            add_wc(defn, letter, counter=counter)  # Add wordcounts
         # The note entry is now added after the literal meaning.
         #note = simplefield2tex(
         #    entry,
@@ -409,65 +910,26 @@ def senses2tex(entry, sense_pos, letter):
         #        )
         #    )
         #tex += note
-        tex += simplefield2tex(
-            s,
-            'anthronote',
-            'note[@type="anthropology"]/form[@lang="en"]/text',
-            level=2, letter=letter
-        )
-        tex += simplefield2tex(
-            s,
-            'semnote',
-            'note[@type="semantics"]/form[@lang="en"]/text',
-            level=2, letter=letter
-        )
-        tex += simplefield2tex(
-            s,
-            'grammarnote',
-            'note[@type="grammar"]/form[@lang="en"]/text',
-            level=2, letter=letter
-        )
-        tex += simplefield2tex(
-            s,
-            'socionote',
-            'note[@type="sociolinguistics"]/form[@lang="en"]/text',
-            level=2, letter=letter
-        )
-        tex += simplefield2tex(
-            s,
-            'discoursenote',
-            'note[@type="discourse"]/form[@lang="en"]/text',
-            level=2, letter=letter
-        )
-        tex += examples2tex(s)
-        tex += '}'
-    return tex
+        fields2tex(s.fields, sense_fields_en, level=2, letter=letter, out=tex, counter=counter)
+        examples2tex(s, out=tex)
+        tex.write('}')
+    if out is None:
+        return tex.getvalue()
 
-def senses2tex_es(entry, sense_pos, letter):
+def senses2tex_es(entry, sense_pos, letter, out=None, counter=None):
     '''Return Spanish language senses in latex format.'''
-    tex = ''
-    senses = entry.findall('sense')
+    tex = TexEmitter() if out is None else out
+    senses = entry.senses
     for idx, s in enumerate(senses):
-        tex += '  \\sense{'
+        tex.write('  \\sense{')
         if len(senses) > 1:
-            tex += r'\textbf{' + '{:d}'.format(idx + 1) + '.} '
-        tex += '\n'
+            tex.write(r'\textbf{' + '{:d}'.format(idx + 1) + '.} ')
+        tex.write('\n')
         if sense_pos is True:
-            tex += sense_pos2tex(s, lang="es")
-        try:
-            definitions = s.findall('definition/form[@lang="eu"]/text')
-            for definition in definitions:
-                defn =  ''.join(definition.itertext()).strip()
-                tex += '    \\definition{' + defn + '}'
-                add_wc(defn, letter)  # Add wordcounts
-        except (AttributeError, TypeError):
-            pass
-        tex += simplefield2tex(
-            s,
-            'scientificname',
-            'field[@type="scientific-name"]/form[@lang="en"]/text',
-            level=2
-        )
+            sense_pos2tex(s, lang="es", out=tex)
+        for defn in s.definitions.get('eu', ()):
+            tex.write('    \\definition{' + defn + '}')
+            add_wc(defn, letter, counter=counter)  # Add wordcounts
         # The note entry is now added after the literal meaning.
         #note = simplefield2tex(
         #    entry,
@@ -482,201 +944,175 @@ def senses2tex_es(entry, sense_pos, letter):
         #        )
         #    )
         #tex += note
-        tex += simplefield2tex(
-            s,
-            'anthronote',
-            'note[@type="anthropology"]/form[@lang="eu"]/text',
-            level=2, letter=letter
-        )
-        tex += simplefield2tex(
-            s,
-            'semnote',
-            'note[@type="semantics"]/form[@lang="eu"]/text',
-            level=2, letter=letter
-        )
-        tex += simplefield2tex(
-            s,
-            'grammarnote',
-            'note[@type="grammar"]/form[@lang="eu"]/text',
-            level=2, letter=letter
-        )
-        tex += simplefield2tex(
-            s,
-            'posspref',
-            f'field[@type="Poss Pref"]/form[@lang="eu"]/text',
-            level=2, letter=letter
-        )
-        tex += simplefield2tex(
-            s,
-            'socionote',
-            'note[@type="sociolinguistics"]/form[@lang="eu"]/text',
-            level=2, letter=letter
-        )
-        tex += simplefield2tex(
-            s,
-            'discoursenote',
-            'note[@type="discourse"]/form[@lang="eu"]/text',
-            level=2, letter=letter
-        )
-        tex += examples2tex(s, lang="es")
-        tex += '}'
-    return tex
+        fields2tex(s.fields, sense_fields_es, level=2, letter=letter, out=tex, counter=counter)
+        examples2tex(s, lang="es", out=tex)
+        tex.write('}')
+    if out is None:
+        return tex.getvalue()
 
-def relforms2tex(entry, letter, lang="en"):
+def relforms2tex(entry, letter, lang="en", out=None, counter=None):
     '''Returns related forms in latex format.'''
-    tex = ''
-    for suffix in ['', '2', '3', '4', '5']:
-        xpath = 'field[@type="RelatedForms{:}"]'.format(suffix)
-        relforms = entry.findall(xpath)
+    tex = TexEmitter() if out is None else out
+    for relforms in entry.relforms:
         for idx, rf in enumerate(relforms):
-            forms = {}
-            for l in ('iqu', lang):
-                try:
-                    forms[l] = ''.join(rf.find('form[@lang="' + l + '"]/text').itertext())
-                except AttributeError:
-                    forms[l] = 'MISSING'
-            tex += '  \\relforms{'
+            tex.write('  \\relforms{')
             if len(relforms) > 1:
-                tex += '{:d}. '.format(idx + 1)
+                tex.write('{:d}. '.format(idx + 1))
 #            tex += '\n'
-            tex += '\n    \\relformiqu{' + forms['iqu'] + '}'
-            tex += '\n    \\relformen{' + forms[lang] + '}'
-            tex += '}'
-            add_wc(forms[lang], letter)
-    return tex
+            tex.write('\n    \\relformiqu{' + rf.forms.get('iqu', 'MISSING') + '}')
+            tex.write('\n    \\relformen{' + rf.forms.get(lang, 'MISSING') + '}')
+            tex.write('}')
+            add_wc(rf.forms.get(lang, 'MISSING'), letter, counter=counter)
+    if out is None:
+        return tex.getvalue()
 
-def relforms2tex_es(entry, letter):
+def relforms2tex_es(entry, letter, out=None, counter=None):
     '''Returns related forms in latex format for Academic Spanish dictionary.'''
-    tex = ''
-    for suffix in ['', '2', '3', '4', '5']:
-        n = '1' if suffix == '' else suffix
-        xpath = f'field[@type="RelatedForms{suffix}"]'
-        relforms = entry.findall(xpath)
+    tex = TexEmitter() if out is None else out
+    for relforms in entry.relforms:
         # Note that each RelatedFormsN field only contains one related form (I think),
         # but we loop just in case.
         for idx, rf in enumerate(relforms):
-            forms = {}
-            for l in ('iqu', 'eu'):
-                try:
-                    forms[l] = ''.join(rf.find(f'form[@lang="{l}"]/text').itertext())
-                except AttributeError:
-                    forms[l] = 'MISSING'
-            # Note that this loop is not correctly placed here if there is actually
+            # Note that the root and POS are not correctly assigned if there is actually
             # more than one related form inside a singled RelatedFormsN field.
-            for tfield, ident, lg in [('iqu', 'root', 'iqu'), ('pos', 'POS', 'en')]:
-                rfxpath = f'field[@type="RelForm {n} {ident}"]/form[@lang="{lg}"]/text'
-                try:
-                    forms[ident] = ''.join(entry.find(rfxpath).itertext())
-                except AttributeError:
-                    forms[ident] = 'MISSING'
-            tex += '  \\relforms{'
+            tex.write('  \\relforms{')
             if len(relforms) > 1:
-                tex += '{:d}. '.format(idx + 1)
-            tex += '\n    \\relformiqu{' + forms['iqu'] + '}'
-            tex += '\n    \\relformpos{' + forms['POS'] + '}'
-            tex += '\n    \\relformeu{' + forms['eu'] + '}'
-            if forms['root'] != 'MISSING':
-                tex += '\n    \\relformiqurt{' + superscriptLH(forms['root']) + '}'
-            tex += '}'
-            add_wc(forms['eu'], letter)
-    return tex
-
-def examples2tex(sense, lang="en"):
+                tex.write('{:d}. '.format(idx + 1))
+            tex.write('\n    \\relformiqu{' + rf.forms.get('iqu', 'MISSING') + '}')
+            tex.write('\n    \\relformpos{' + rf.pos + '}')
+            tex.write('\n    \\relformeu{' + rf.forms.get('eu', 'MISSING') + '}')
+            if rf.root != 'MISSING':
+                tex.write('\n    \\relformiqurt{' + superscriptLH(rf.root) + '}')
+            tex.write('}')
+            add_wc(rf.forms.get('eu', 'MISSING'), letter, counter=counter)
+    if out is None:
+        return tex.getvalue()
+
+def examples2tex(sense, lang="en", out=None):
     '''Returns examples in latex format.'''
-    tex = ''
-    examples = sense.findall('example')
-    for ex in examples:
-        tex += '    \\example{'
-        tex += '\n'
-        try:
-            iquex = simplefield2tex(
-                ex, 'exampleiqu', 'form[@lang="iqu"]/text',
-                level=3, missing_ok=False, empty_ok=False
-            )
-        except:
-            iquex = '\n      \\exampleiqu{MISSING}'
-        tex += iquex
+    tex = TexEmitter() if out is None else out
+    for ex in sense.examples:
+        tex.write('    \\example{')
+        tex.write('\n')
+        if ex.iqu is None:
+            tex.write('\n      \\exampleiqu{MISSING}')
+        else:
+            tex.write('      \\exampleiqu{' + ex.iqu.strip() + '}')
         try:
-            enex = simplefield2tex(
-                ex,
-                'exampleen',
-                f'translation[@type="Free translation"]/form[@lang="{lang}"]/text',
-                level=3, missing_ok=False, empty_ok=False
-            )
-        except AttributeError:
-            enex = '\n      \\exampleen{MISSING}'
-        tex += enex
-        tex += '}'
-    return tex
+            tex.write('      \\exampleen{' + ex.translations[lang].strip() + '}')
+        except KeyError:
+            tex.write('\n      \\exampleen{MISSING}')
+        tex.write('}')
+    if out is None:
+        return tex.getvalue()
 
 
-def simplefield2tex(node, texfld, xpath, level=1, missing_ok=True, empty_ok=True, letter=None, do_superscriptLH=False, activemiddle_es=False):
-    '''Return a simple field from a node as a latex command.'''
-    tex = ''
-    val = None
-    try:
-        val = nodetext(node.find(xpath))
-        assert(val is not None)
+def simplefield2tex(node, texfld, xpath, level=1, missing_ok=True, empty_ok=True, letter=None, do_superscriptLH=False, activemiddle_es=False, out=None, counter=None):
+    '''Return a simple field from a FieldTable or node as a latex command, or
+    write it to `out`.'''
+    tex = TexEmitter() if out is None else out
+    if not isinstance(node, FieldTable):
+        node = FieldTable(node)
+    val = node.get(xpath)
+    if val is None:
+        if missing_ok is not True:
+            raise AttributeError(f'Missing field {xpath}')
+    else:
         if do_superscriptLH:
             val = superscriptLH(val)
         if activemiddle_es:
             val = activemiddle_replace_es(val)
-        tex += '  ' * level + '\\' + texfld + '{' + val.strip() + '}'
+        tex.write('  ' * level + '\\' + texfld + '{' + val.strip() + '}')
         if texfld in ('litmean', 'anthronote', 'grammarnote', 'semnote', 'socionote', 'discoursenote'):
-            add_wc(val.strip(), letter)
-    except AttributeError as e:
-        if missing_ok is True:
-            pass
-        else:
-            raise e
-    except AssertionError as e:
-        if empty_ok is True:
-            pass
-        else:
-            raise e
-    return tex
+            add_wc(val.strip(), letter, counter=counter)
+    if out is None:
+        return tex.getvalue()
 
-def entry2pglex(e):
-    ginfo = e.find('sense/grammatical-info').attrib['value'].strip()
-    try:
-        ginfo = posmap[ginfo]
-    except (KeyError, AttributeError):
-        pass
+def pglex_record(entry):
+    '''Return the JSON record of LexEntry entry for the web dictionary as a
+    dict, without the fields of pglex_links(). Raise AttributeError if the
+    entry has no headword.'''
+    headword = get_headword(entry)
     d = {
-        'id': e.attrib['guid'],
-        'lex': get_headword(e),
-        'pos': ginfo,
-        'defn': [nodetext(g) for g in e.findall('sense/gloss[@lang="ga"]/text')],
+        'id': entry.guid,
+        'lex': headword,
+        'sortword': lookup_key(headword),
+        'pos': entry.pos,
+        'defn': entry.glosses,
+        'senses': [
+            {
+                'id': s.guid,
+                'pos': s.pos,
+                'definitions': s.definitions,
+                'examples': [
+                    {'iqu': x.iqu, 'translations': x.translations} for x in s.examples
+                ],
+                'reversals': {
+                    lang: [rev.strip() for texts in revs for rev in texts]
+                    for lang, revs in s.reversals.items()
+                },
+            }
+            for s in entry.senses
+        ],
     }
+    if entry.excluded:
+        d['excluded'] = True
+    if entry.suffix:
+        d['suffix'] = True
+    return d
+
+def pglex_links(eid, relations, index):
+    '''Return the (key, value) pairs of the JSON record of entry `eid` that
+    are looked up in LiftIndex `index`: the variants of the entry by variant
+    type and the main words it is a variant of.'''
+    links = []
     try:
-        d['variants'] = variantmap[e.attrib['id']]
+        variants = index.variantmap[eid]
     except KeyError:
         pass
-    return json.dumps(d)
+    else:
+        links.append(('variants', {varnames[label]: forms for label, forms in variants.items()}))
+    variantof = [
+        {'lex': index.headwords[ref], 'type': vartype}
+        for ref, vartype in relations if ref in index.headwords
+    ]
+    if len(variantof) > 0:
+        links.append(('variantof', variantof))
+    return links
 
-def entry2dict_de(entry, variantmap, mainwdmap, irreg_pl_map):
+def entry2pglex(entry, index):
+    '''Return LexEntry entry as a JSON record for the web dictionary, with
+    its variants and main words looked up in LiftIndex `index`. Raise
+    AttributeError if the entry has no headword.'''
+    d = pglex_record(entry)
+    d.update(pglex_links(entry.id, entry.relations, index))
+    return json.dumps(d, ensure_ascii=False)
+
+def entry2dict_de(entry, variantmap, mainwdmap, irreg_pl_map, headword=None, counter=None):
     '''
     Return contents of <entry> node as a dict with useful values
     for diccionario escolar.
     '''
-    headword = get_headword(entry)
-    tex = r'\entry{' + headword + '}{'
-    tex += '\n\headword{' + headword + '}'
-    tex += pos2tex(entry, lang='iqu')
-    glosses = entry.findall('sense/gloss[@lang="ga"]/text')
+    entry = lexentry(entry)
+    if headword is None:
+        headword = get_headword(entry)
+    tex = TexEmitter()
+    tex.write(r'\entry{' + headword + '}{')
+    tex.write('\n\headword{' + headword + '}')
+    pos2tex(entry, lang='iqu', out=tex)
+    glosses = entry.glosses
     irreg_pl = get_irreg_pl(glosses)
-    gltex = glosses2tex(glosses)
     try:
-        tex += '\n' + r'  \variants{Plural irregular de: ' + irreg_pl_map[headword] + '}'
+        tex.write('\n' + r'  \variants{Plural irregular de: ' + irreg_pl_map[headword] + '}')
     except KeyError:
         pass
         try:
-            tex += mainwdmap[entry.attrib['id']]
+            tex.write(mainwdmap[entry.id])
         except KeyError:
-            tex += gltex
+            glosses2tex(glosses, out=tex)
             #xpath = 'lexical-unit/form[@lang="iqu"]/text'
             #try:
-            #    variants = [v.strip() for v in variantmap[entry.attrib['id']] if v.strip() not in irreg_pl]
+            #    variants = [v.strip() for v in variantmap[entry.id] if v.strip() not in irreg_pl]
             #    if len(variants) > 0:
             #        if len(variants) == 1:
             #            tex += r'  \variants{Variante: ' + variants[0] + '}\n'
@@ -686,38 +1122,38 @@ def entry2dict_de(entry, variantmap, mainwdmap, irreg_pl_map):
             #    pass
             try:
                 variants = []
-                for vartype in variantmap[entry.attrib['id']]:
+                for vartype in variantmap[entry.id]:
                     variants += [
                         v.strip() \
-                        for v in variantmap[entry.attrib['id']][vartype] \
+                        for v in variantmap[entry.id][vartype] \
                         if v.strip() not in irreg_pl
                     ]
                 if len(variants) > 0:
-                    variants.sort(key=lambda x: str2sort(x))
+                    variants.sort(key=str2sort)
                     intro = 'Variante'
                     if len(variants) > 1:
                         intro += 's'
-                    tex += '\n' + r'  \variants{' + intro + ': ' + ', '.join([v for v in variants]) + '}'
+                    tex.write('\n' + r'  \variants{' + intro + ': ' + ', '.join([v for v in variants]) + '}')
             except KeyError:
                 pass
    
-    tex += '}'
+    tex.write('}')
     try:
         return ({
             'firstletter': firstletter(headword).upper(),
             'headword': headword,
             'sortword': str2sort(headword),
-            'tex': tex
+            'tex': tex.getvalue()
         }, None)
     except Exception as e:
         return ({'firstletter': '', 'headword': '', 'sortword': '', 'tex': ''}, e)
 
-def reventry2dict_de(rev, e):
+def reventry2dict_de(rev, e, counter=None):
     '''
     Return contents of <entry> node as a dict with useful values
     for diccionario escolar.
     '''
-    return reventry2dict_acad(rev, e)
+    return reventry2dict_acad(rev, e, counter=counter)
 
 #    # TODO: check that there is only one reversal per <entry>
 #    rev = nodetext(entry.find('sense/reversal[@type="es"]/form/text'))
@@ -760,21 +1196,25 @@ def reventry2dict_de(rev, e):
 #    except Exception as e:
 #        return ({'firstletter': '', 'headword': '', 'sortword': '', 'tex': ''}, e)
 
-def entry2dict_acad(entry, variantmap, mainwdmap, irreg_pl_map, impf_rt_map):
+def entry2dict_acad(entry, variantmap, mainwdmap, irreg_pl_map, impf_rt_map, headword=None, counter=None):
     '''
     Return contents of <entry> node as a dict with useful values
     for academic dictionary.
     '''
-    headword = get_headword(entry)
+    entry = lexentry(entry)
+    if headword is None:
+        headword = get_headword(entry)
     letter = firstletter(headword).upper()
-    tex = '\n' + r'\entry{' + headword + '}{'
-    tex += '\headword{' + headword + '}'
-    tex += lexeme2tex(entry)
+    tex = TexEmitter()
+    fields = entry.fields
+    tex.write('\n' + r'\entry{' + headword + '}{')
+    tex.write('\headword{' + headword + '}')
+    lexeme2tex(entry, out=tex)
     try:
-        tex += '\n  \impfrt{\impfrtlab ' + impf_rt_map[entry.attrib['id']] + '}'
+        tex.write('\n  \impfrt{\impfrtlab ' + impf_rt_map[entry.id] + '}')
     except KeyError:
         pass
-    glosses = entry.findall('sense/gloss[@lang="ga"]/text')
+    glosses = entry.glosses
     #irreg_pl = get_irreg_pl(glosses)
     try:
         #tex += '\n' + r'  \variants{\irregpllab \vartext{' + irreg_pl_map[headword] + '}}'
@@ -783,185 +1223,137 @@ def entry2dict_acad(entry, variantmap, mainwdmap, irreg_pl_map, impf_rt_map):
     finally:
         isvariant = False
         try:
-            tex += mainwdmap[entry.attrib['id']]
+            tex.write(mainwdmap[entry.id])
             isvariant = True
         except KeyError:
             pass
         finally:
-            tex += simplefield2tex(
-                entry, 'irregpl', 'field[@type="Irreg Pl"]/form/text', level=1
+            simplefield2tex(
+                fields, 'irregpl', 'field[@type="Irreg Pl"]/form/text', level=1, out=tex
             )
-            tex += simplefield2tex(
-                entry,
+            simplefield2tex(
+                fields,
                 'irregposs',
                 'field[@type="Irreg Poss"]/form/text',
-                level=1
+                level=1, out=tex
             )
             for irform in ['irregthirdposs', 'irregfirstposs']:
                 try:
                     variants = ', '.join(
                         [
                             v.strip() \
-                            for v in variantmap[entry.attrib['id']][irform]
+                            for v in variantmap[entry.id][irform]
                         ]
                     )
-                    tex += ' \\' + irform + '{' + variants + '}'
+                    tex.write(' \\' + irform + '{' + variants + '}')
                 except KeyError:
                     pass
-            tex += simplefield2tex(
-                entry, 'derivroot', 'field[@type="Deriv Root"]/form/text', level=1
+            simplefield2tex(
+                fields, 'derivroot', 'field[@type="Deriv Root"]/form/text', level=1, out=tex
             )
-            tex += simplefield2tex(
-                entry, 'litmean', 'field[@type="literal-meaning"]/form[@lang="en"]/text', level=1, letter=letter
+            simplefield2tex(
+                fields, 'litmean', 'field[@type="literal-meaning"]/form[@lang="en"]/text', level=1, letter=letter, out=tex, counter=counter
             )
-            tex += simplefield2tex(
-                entry, 'note', 'note/form[@lang="en"]/text', level=1
+            simplefield2tex(
+                fields, 'note', 'note/form[@lang="en"]/text', level=1, out=tex
             )
-            tex += simplefield2tex(
-                entry, 'pronnote', 'pronunciation/form/text', level=1
+            simplefield2tex(
+                fields, 'pronnote', 'pronunciation/form/text', level=1, out=tex
             )
             if isvariant is False:
                 if get_first_pos(entry) in verb_pos:
-                    tex += senses2tex(entry, sense_pos=True, letter=letter)
+                    senses2tex(entry, sense_pos=True, letter=letter, out=tex, counter=counter)
                 else:
-                    tex += pos2tex(entry)
-                    tex += senses2tex(entry, sense_pos=False, letter=letter)
+                    pos2tex(entry, out=tex)
+                    senses2tex(entry, sense_pos=False, letter=letter, out=tex, counter=counter)
             else:
-                s = entry.find('sense')
-                if s is not None:
-                    tex += simplefield2tex(
-                        s,
-                        'scientificname',
-                        'field[@type="scientific-name"]/form[@lang="en"]/text',
-                        level=2
-                    )
-                    tex += simplefield2tex(
-                        s,
-                        'anthronote',
-                        'note[@type="anthropology"]/form[@lang="en"]/text',
-                        level=2, letter=letter
-                    )
-                    tex += simplefield2tex(
-                        s,
-                        'semnote',
-                        'note[@type="semantics"]/form[@lang="en"]/text',
-                        level=2, letter=letter
-                    )
-                    tex += simplefield2tex(
-                        s,
-                        'grammarnote',
-                        'note[@type="grammar"]/form[@lang="en"]/text',
-                        level=2, letter=letter
-                    )
-                    tex += simplefield2tex(
-                        s,
-                        'socionote',
-                        'note[@type="sociolinguistics"]/form[@lang="en"]/text',
-                        level=2, letter=letter
-                    )
-                    tex += simplefield2tex(
-                        s,
-                        'discoursenote',
-                        'note[@type="discourse"]/form[@lang="en"]/text',
-                        level=2, letter=letter
-                    )
+                if len(entry.senses) > 0:
+                    s = entry.senses[0]
+                    fields2tex(s.fields, sense_fields_en, level=2, letter=letter, out=tex, counter=counter)
                     #tex += examples2tex(s)
-            tex += simplefield2tex(
-                entry,
+            simplefield2tex(
+                fields,
                 'activemiddle',
                 'field[@type="activemiddle"]/form/text',
-                level=1
+                level=1, out=tex
             )
-            tex += relforms2tex(entry, letter)
+            relforms2tex(entry, letter, out=tex, counter=counter)
             try:
-                for vartype in variantmap[entry.attrib['id']]:
+                for vartype in variantmap[entry.id]:
                     if vartype in ['irregthirdposs', 'irregfirstposs', 'irregpllab']:
                         continue
                     variants = [
                         v.strip() \
-                        for v in variantmap[entry.attrib['id']][vartype] #\
+                        for v in variantmap[entry.id][vartype] #\
                         #if v.strip() not in irreg_pl
                     ]
                     if len(variants) > 0:
                         if len(variants) > 1 and vartype in ['freevarlab', 'dialectvarlab']:
                             vartype += 's'
-                        tex += '\n' + r'  \variants{' + '\\' + vartype + r' \vartext{' + ', '.join([v for v in variants]) + '}}'
+                        tex.write('\n' + r'  \variants{' + '\\' + vartype + r' \vartext{' + ', '.join([v for v in variants]) + '}}')
             except KeyError:
                 pass
-    tex += '}'
+    tex.write('}')
     try:
         return ({
             'firstletter': letter,
             'headword': headword,
             'sortword': str2sort(headword),
-            'tex': tex
+            'tex': tex.getvalue()
         }, None)
     except Exception as e:
         return ({'firstletter': '', 'headword': '', 'sortword': '', 'tex': ''}, e)
 
-def reventry2dict_acad(rev, e):
+def reventry2dict_acad(rev, e, counter=None):
     '''
     Return reversals of rev for academic dictionary.
     '''
-    tex = ''
+    tex = TexEmitter()
     parts_of_speech = list(e.keys())
     parts_of_speech.sort()
     for mypos in parts_of_speech:
-        tex += '\n' + r'\reventry{' + rev + '}{'
-        tex += '\n' + r'\headword{' + rev + '}'
+        tex.write('\n' + r'\reventry{' + rev + '}{')
+        tex.write('\n' + r'\headword{' + rev + '}')
         try:
-            tex += '\n' + r'  \pos{' + posmap_en[mypos] + '}'
+            tex.write('\n' + r'  \pos{' + posmap_en[mypos] + '}')
         except KeyError:
-            tex += '\n' + r'  \pos{' + mypos + '}'
+            tex.write('\n' + r'  \pos{' + mypos + '}')
         revheadwd = ', '.join(e[mypos])
-        tex += '\n  \gloss{' + revheadwd + '}'
-        tex += '}\n\n'
-    sortword = rev.strip().replace(r'\sci ', '').replace(r'\sp ', '').upper()
-    sortword = sortword \
-        .replace('Á', 'A') \
-        .replace('É', 'E') \
-        .replace('Í', 'I') \
-        .replace('Ó', 'O') \
-        .replace('Ú', 'U') \
-        .replace('Ñ', 'N') \
-        .replace('ñ', 'n') \
-        .replace('-', '') \
-        .replace('=', '') \
-        .replace('“', '') \
-        .replace('”', '') \
-        .replace('"', '') \
-        .replace('`', '') \
-        .replace('¡', '') \
-        .replace('{', '') \
-        .replace('}', '')
-    m = re.search('(?P<firstletter>[^\W\d_])', sortword, re.UNICODE)
-    letter = m.groupdict()['firstletter']
-    add_wc(rev, letter, rev=True)
+        tex.write('\n  \gloss{' + revheadwd + '}')
+        tex.write('}\n\n')
+    sortword, letter = revcollator_acad.key(rev)
+    if letter is None:
+        return ({'firstletter': '', 'headword': '', 'sortword': '', 'tex': ''}, ValueError(f'No letter in reversal {rev}'))
+    add_wc(rev, letter, counter=counter)
     return ({
         'firstletter': letter,
         'headword': rev,
         'sortword': sortword,
-        'tex': tex
+        'tex': tex.getvalue()
     }, None)
 
-def entry2dict_acad_es(entry, variantmap, mainwdmap, irreg_pl_map, impf_rt_map):
+def entry2dict_acad_es(entry, variantmap, mainwdmap, irreg_pl_map, impf_rt_map, headword=None, counter=None):
     '''
     Return contents of <entry> node as a dict with useful values
     for Spanish-language academic dictionary.
     '''
-    headword = get_headword(entry)
+    entry = lexentry(entry)
+    if headword is None:
+        headword = get_headword(entry)
     letter = firstletter(headword).upper()
     headword = superscriptLH(headword)
-    tex = '\n' + r'\entry{' + headword + '}{'
-    tex += '\headword{' + headword + '}'
+    tex = TexEmitter()
+    fields = entry.fields
+    tex.write('\n' + r'\entry{' + headword + '}{')
+    tex.write('\headword{' + headword + '}')
 #!# Commented out for new ordering
 #    tex += lexeme2tex(entry)
 #    try:
-#        tex += '\n  \impfrt{\impfrtlab ' + impf_rt_map[entry.attrib['id']] + '}'
+#        tex += '\n  \impfrt{\impfrtlab ' + impf_rt_map[entry.id] + '}'
 #    except KeyError:
 #        pass
 #!# End commented out for new ordering
-    glosses = entry.findall('sense/gloss[@lang="ga"]/text')
+    glosses = entry.glosses
     try:
         #tex += '\n' + r'  \variants{\irregpllab \vartext{' + irreg_pl_map[headword] + '}}'
         pass
@@ -969,7 +1361,7 @@ def entry2dict_acad_es(entry, variantmap, mainwdmap, irreg_pl_map, impf_rt_map):
     finally:
         isvariant = False
         try:
-            tex += mainwdmap[entry.attrib['id']]
+            tex.write(mainwdmap[entry.id])
             isvariant = True
         except KeyError:
             pass
@@ -980,177 +1372,1923 @@ def entry2dict_acad_es(entry, variantmap, mainwdmap, irreg_pl_map, impf_rt_map):
                     # Suppress these
                     return ({}, 'pass')
                 elif first_pos in verb_pos:
-                    tex += senses2tex_es(entry, sense_pos=True, letter=letter)
+                    senses2tex_es(entry, sense_pos=True, letter=letter, out=tex, counter=counter)
                 else:
-                    tex += pos2tex(entry, lang="es")
-                    tex += senses2tex_es(entry, sense_pos=False, letter=letter)
+                    pos2tex(entry, lang="es", out=tex)
+                    senses2tex_es(entry, sense_pos=False, letter=letter, out=tex, counter=counter)
             else:
-                s = entry.find('sense')
-                if s is not None:
-                    tex += simplefield2tex(
-                        s,
-                        'scientificname',
-                        'field[@type="scientific-name"]/form[@lang="en"]/text',
-                        level=2
-                    )
-                    tex += simplefield2tex(
-                        s,
-                        'anthronote',
-                        'note[@type="anthropology"]/form[@lang="eu"]/text',
-                        level=2, letter=letter
-                    )
-                    tex += simplefield2tex(
-                        s,
-                        'semnote',
-                        'note[@type="semantics"]/form[@lang="eu"]/text',
-                        level=2, letter=letter
-                    )
-                    tex += simplefield2tex(
-                        s,
-                        'grammarnote',
-                        'note[@type="grammar"]/form[@lang="eu"]/text',
-                        level=2, letter=letter
-                    )
-                    tex += simplefield2tex(
-                        s,
-                        'posspref',
-                        f'field[@type="Poss Pref"]/form[@lang="eu"]/text',
-                        level=2, letter=letter
-                    )
-                    tex += simplefield2tex(
-                        s,
-                        'socionote',
-                        'note[@type="sociolinguistics"]/form[@lang="eu"]/text',
-                        level=2, letter=letter
-                    )
-                    tex += simplefield2tex(
-                        s,
-                        'discoursenote',
-                        'note[@type="discourse"]/form[@lang="eu"]/text',
-                        level=2, letter=letter
-                    )
-                    tex += examples2tex(s)
-            tex += ' ~$\\parallel$~ '
+                if len(entry.senses) > 0:
+                    s = entry.senses[0]
+                    fields2tex(s.fields, sense_fields_es, level=2, letter=letter, out=tex, counter=counter)
+                    examples2tex(s, out=tex)
+            tex.write(' ~$\\parallel$~ ')
             #!# New additions
             #tex += simplefield2tex(
             #    entry, 'pronnote', 'pronunciation/form/text', level=1
             #)
-            efields = [
-                ('litmean', 'literal-meaning', 'eu'),
-                ('note', 'note/form[@lang="eu"]/text', ''),
-                ('anthnoteentry', 'Entry Anthro', 'eu'),
-                ('semnoteentry', 'Entry Semantics', 'eu'),
-                ('gramnoteentry', 'Entry Grammar', 'eu'),
-                ('socionoteentry', 'Entry Socioling', 'eu'),
-                ('lexeme', '', ''),
-                ('derivroot', 'Deriv Root', ''),
-                ('irregpl', 'Irreg Pl', ''),
-                ('irregposs', 'Irreg Poss', ''),
-                ('irregposspl', 'Irreg Poss Pl', 'iqu'),
-                ('irregfirstposs', '', ''),
-                ('irregthirdposs', '', ''),
-                ('altpronuncnote', 'Alternate Pronunciation', 'eu'),
-                ('altpronunc', 'Alternate Pronunciation', 'iqu'),
-            ]
-            for tfield, ident, lg in efields:
+            for tfield, xpath, ssLH in entry_fields_acad_es:
                 if tfield == 'lexeme':
-                    tex += lexeme2tex(entry, do_superscriptLH=True)
+                    lexeme2tex(entry, do_superscriptLH=ssLH, out=tex)
                     continue
                 elif tfield in ('irregfirstposs', 'irregthirdposs'):
                     try:
                         irp = ', '.join(
                             [
                                 v.strip() \
-                                for v in variantmap[entry.attrib['id']][tfield]
+                                for v in variantmap[entry.id][tfield]
                             ]
                         )
-                        tex += ' \\' + tfield + '{' + irp + '}'
+                        tex.write(' \\' + tfield + '{' + irp + '}')
                     except KeyError:
                         pass
                 else:
-                    lgattr = '' if lg == '' else f'[@lang="{lg}"]'
-                    xpath = ident if '/' in ident else f'field[@type="{ident}"]/form{lgattr}/text'
-                    ssLH = True if tfield in ('derivroot', 'altpronunc') else False
-                    tex += simplefield2tex(entry, tfield, xpath, level=1, do_superscriptLH=ssLH)
+                    simplefield2tex(fields, tfield, xpath, level=1, do_superscriptLH=ssLH, out=tex, counter=counter)
             #!# End new additions
             for vartype in order_varlab_acad_es:
                 try:
                     vstr = [
                         v.strip() \
-                        for v in variantmap[entry.attrib['id']][vartype]
+                        for v in variantmap[entry.id][vartype]
                     ]
                     if len(vstr) > 0:
                         if len(vstr) > 1 and vartype in ['freevarlab', 'dialectvarlab']:
                             vartype += 's'
-                        tex += '\n' + r'  \variants{' + '\\' + vartype + r' \vartext{' + ', '.join([v for v in vstr]) + '}}'
+                        tex.write('\n' + r'  \variants{' + '\\' + vartype + r' \vartext{' + ', '.join([v for v in vstr]) + '}}')
                 except KeyError:
                     pass
-            tex += simplefield2tex(
-                entry,
+            simplefield2tex(
+                fields,
                 'activemiddle',
                 'field[@type="activemiddle"]/form/text',
                 level=1,
-                activemiddle_es=True
+                activemiddle_es=True, out=tex
             )
-            tex += relforms2tex_es(entry, letter)
-    tex += '}'
+            relforms2tex_es(entry, letter, out=tex, counter=counter)
+    tex.write('}')
     try:
         return ({
             'firstletter': letter,
             'headword': headword,
             'sortword': str2sort(headword),
-            'tex': tex
+            'tex': tex.getvalue()
         }, None)
     except Exception as e:
         return ({'firstletter': '', 'headword': '', 'sortword': '', 'tex': ''}, e)
 
-def reventry2dict_acad_es(rev, e):
+def reventry2dict_acad_es(rev, e, counter=None):
     '''
     Return reversals of rev for Spanish-language academic dictionary.
     '''
-    tex = ''
+    tex = TexEmitter()
     parts_of_speech = list(e.keys())
     parts_of_speech.sort()
     for mypos in parts_of_speech:
-        tex += '\n' + r'\reventry{' + rev + '}{'
-        tex += '\n' + r'\headword{' + rev + '}'
+        tex.write('\n' + r'\reventry{' + rev + '}{')
+        tex.write('\n' + r'\headword{' + rev + '}')
         try:
-            tex += '\n' + r'  \pos{' + posmap_es[mypos] + '}'
+            tex.write('\n' + r'  \pos{' + posmap_es[mypos] + '}')
         except KeyError:
-            tex += '\n' + r'  \pos{' + mypos + ' (TODO: FIELD NOT MAPPED)}'
+            tex.write('\n' + r'  \pos{' + mypos + ' (TODO: FIELD NOT MAPPED)}')
         revheadwd = ', '.join(e[mypos])
-        tex += '\n  \gloss{' + revheadwd + '}'
-        tex += '}\n\n'
-
-    # Remove tex commands.
-    sortword = re.sub(r'\\\w+{([^}]+)}', r'\1', rev.strip()).upper()
-
-    sortword = sortword \
-        .replace('Á', 'A') \
-        .replace('É', 'E') \
-        .replace('Í', 'I') \
-        .replace('Ó', 'O') \
-        .replace('Ú', 'U') \
-        .replace('Ñ', 'N') \
-        .replace('ñ', 'n') \
-        .replace('-', '') \
-        .replace('=', '') \
-        .replace('¿', '') \
-        .replace('?', '') \
-        .replace('“', '') \
-        .replace('”', '') \
-        .replace('"', '') \
-        .replace('`', '') \
-        .replace('¡', '') \
-        .replace('{', '') \
-        .replace('}', '')
-    m = re.search('(?P<firstletter>[^\W\d_])', sortword, re.UNICODE)
-    letter = m.groupdict()['firstletter']
-    add_wc(rev, letter, rev=True)
+        tex.write('\n  \gloss{' + revheadwd + '}')
+        tex.write('}\n\n')
+
+    sortword, letter = revcollator_acad_es.key(rev)
+    if letter is None:
+        return ({'firstletter': '', 'headword': '', 'sortword': '', 'tex': ''}, ValueError(f'No letter in reversal {rev}'))
+    add_wc(rev, letter, counter=counter)
     return ({
         'firstletter': letter,
         'headword': rev,
         'sortword': sortword,
-        'tex': tex
+        'tex': tex.getvalue()
     }, None)
 
+class LiftIndex(object):
+    '''Lookup tables and variant maps for the entries of a LIFT export. If
+    `keep_entries` is False only the strings needed for the maps are kept.'''
+    def __init__(self, entries=(), keep_entries=True):
+        self.keep_entries = keep_entries
+        self.entries = {}
+        self.guids = {}
+        self.headwords = {}
+        # (entry id, entry headword, variant form, refid, variant type) tuples.
+        self.relations = []
+        self.irreg_pl_map = {}
+        for entry in entries:
+            self.add(entry)
+        self.build_maps()
+
+    @classmethod
+    def from_file(cls, source):
+        '''Build an index by streaming `source` without keeping its entries.'''
+        return cls(iterentries(source), keep_entries=False)
+
+    def add(self, entry):
+        '''Add the lookups and relations of one entry, a LexEntry or an
+        <entry> node, to the index.'''
+        entry = lexentry(entry)
+        eid = entry.id
+        headword = entry.headword
+        if self.keep_entries is True:
+            self.entries.setdefault(eid, entry)
+            self.guids.setdefault(entry.guid, entry)
+        if headword is not None:
+            self.headwords.setdefault(eid, headword)
+        for refid, vartype in entry.relations:
+            self.relations.append((eid, headword, entry.varform, refid, vartype))
+        for ipl in get_irreg_pl(entry.glosses):
+            self.irreg_pl_map[ipl] = headword
+
+    def update(self, entries, changed, removed=()):
+        '''Patch the index after a new export of the LIFT file, given all its
+        entries in export order, the `changed` ones and the `removed` guids.'''
+        changed = [lexentry(entry) for entry in changed]
+        gone = set(removed)
+        gone.update(entry.guid for entry in changed)
+        for guid in gone:
+            try:
+                old = self.guids.pop(guid)
+            except KeyError:
+                continue
+            if self.entries.get(old.id) is old:
+                del self.entries[old.id]
+            if self.headwords.get(old.id) == old.headword:
+                del self.headwords[old.id]
+        for entry in changed:
+            if self.keep_entries is True:
+                self.entries.setdefault(entry.id, entry)
+                self.guids.setdefault(entry.guid, entry)
+            if entry.headword is not None:
+                self.headwords.setdefault(entry.id, entry.headword)
+        # The order of the variants in `variantmap` and the winner of a shared
+        # irregular plural follow the export order, so these are collected again.
+        self.relations = []
+        self.irreg_pl_map = {}
+        for entry in entries:
+            for refid, vartype in entry.relations:
+                self.relations.append((entry.id, entry.headword, entry.varform, refid, vartype))
+            for ipl in get_irreg_pl(entry.glosses):
+                self.irreg_pl_map[ipl] = entry.headword
+        self.build_maps()
+
+    def build_maps(self):
+        '''Resolve the collected relations into the variant and main word maps.'''
+        self.variantmap = {}
+        self.mainwdmap_es = {}
+        self.mainwdmap_acad_es = {}
+        self.mainwdmap_en = {}
+        self.impf_rt_map = {}
+        self.missingvariants = {}
+        for eid, headword, variant, refid, vartype in self.relations:
+            if refid == '':
+                continue
+            try:
+                mainwd = self.headwords[refid]
+            except KeyError:
+                print('Could not find entry {:}'.format(refid))
+                continue
+            try:
+                parts = vartype.split()
+                parts[0] = parts[0].capitalize()  # capitalize first word only and leave others as capitalized
+                vartype = ' '.join(parts)
+            except (AttributeError, IndexError):
+                print('Could not get variant type for entry {:}'.format(refid))
+                continue
+            try:
+                vartype = varmap[vartype]
+            except KeyError:
+                print('WARNING: Unknown variant type {:} for entry {:}'.format(vartype, eid))
+                continue
+            if vartype not in order_varlab_acad_es + ['irregfirstposs', 'irregthirdposs']:
+                self.missingvariants[vartype] = ''
+            self.mainwdmap_es[eid] = '\n  \\variantof{Variante de: \\textbf{' + mainwd + '}}'
+            self.mainwdmap_acad_es[eid] = '\n  \\variants{\\' + vartype.replace('lab', 'of') + '{' + mainwd + '}}'
+            self.mainwdmap_en[eid] = '\n  \\variantof{\\' + vartype + ' of \\vartext{' + mainwd + '}}'
+            if vartype == 'impfrtlab':
+                self.impf_rt_map[refid] = headword
+                continue   # Do not include in variantmap
+            try:
+                self.variantmap[refid][vartype].append(variant)
+            except KeyError:
+                self.variantmap.setdefault(refid, {})[vartype] = [variant]
+
+def sense_reversals(entry, headword, lang):
+    '''Yield the (reversal, part of speech) pairs of the `lang` reversals of
+    each sense of LexEntry entry, using the part of speech of the sense they
+    belong to.'''
+    for sns in entry.senses:
+        pos = sns.pos
+        if pos is None:
+            print(f'Error in sense (id {sns.id}). Could not find grammatical-info (POS).\n')
+            # The notebook loop this replaces reused the part of speech of the
+            # sense (or entry) before it here. An empty \pos{} keeps the
+            # reversals of an entry independent of the entries before it.
+            pos = ''
+        for texts in sns.reversals.get(lang, ()):
+            if len(texts) == 0:
+                print(f'WARNING: empty reversal for entry {headword}: {entry.guid}')
+                continue
+            yield texts[0].strip(), pos
+
+def entry_reversals(entry, headword, lang):
+    '''Yield the (reversal, part of speech) pairs of the `lang` reversals of
+    LexEntry entry, using the part of speech of the first sense for all of
+    them.'''
+    revs = [
+        rev for sns in entry.senses for texts in sns.reversals.get(lang, ()) for rev in texts
+    ]
+    if len(revs) == 0:
+        return
+    # NOTE: This assumes all reversals of entry are same part of speech.
+    pos = get_first_pos(entry)
+    for rev in revs:
+        if r'\sci ' in rev:
+            continue
+        yield rev, pos
+
+def revitem_key(item):
+    '''Sort key of a (sort key, headword) item of a ReversalIndex.'''
+    return item[0]
+
+class ReversalIndex(object):
+    '''Reversal entries of several reversal targets, collected in a single
+    pass over the entries.'''
+    def __init__(self, targets=None, entries=()):
+        if targets is None:
+            targets = list(rev_targets)
+        self.targets = [(t, rev_targets[t][1], rev_targets[t][2]) for t in targets]
+        self.reversals = {t: {} for t in targets}
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry, headword=None, skip=None):
+        '''Add the reversals of entry, a LexEntry or an <entry> node, to the
+        index of each target. Excluded entries and suffixes are skipped.'''
+        entry = lexentry(entry)
+        if headword is None:
+            headword = get_headword(entry)
+            skip = entry.excluded or entry.suffix
+        if skip:
+            return
+        item = (sortkey(headword).sort, headword)
+        for t, lang, reversals_of in self.targets:
+            reversals = self.reversals[t]
+            for rev, pos in reversals_of(entry, headword, lang):
+                byrev = reversals.get(rev)
+                if byrev is None:
+                    reversals[rev] = {pos: [item]}
+                elif pos in byrev:
+                    byrev[pos].append(item)
+                else:
+                    byrev[pos] = [item]
+
+    def __len__(self):
+        return sum(len(reversals) for reversals in self.reversals.values())
+
+    def count(self, t):
+        '''Return the number of reversals of target `t`.'''
+        return len(self.reversals[t])
+
+    def sort(self, t):
+        '''Sort the headwords of each reversal and part of speech of target
+        `t` in place. Lists with a headword that has characters outside the
+        alphabet are left unsorted.'''
+        for rev, byrev in self.reversals[t].items():
+            for pos, items in byrev.items():
+                for key, headword in items:
+                    if key is None:
+                        try:
+                            str2sort(headword)
+                        except KeyError as e:
+                            print(f'Found illegal character {e}')
+                        msg = f'Could not create sort entries for reversals {[hw for _, hw in items]}.\n'
+                        print(msg)
+                        break
+                else:
+                    items.sort(key=revitem_key)
+
+    def items(self, t):
+        '''Yield the (reversal, {pos: headwords}) pairs of target `t`.'''
+        for rev, byrev in self.reversals[t].items():
+            yield rev, {pos: [hw for _, hw in items] for pos, items in byrev.items()}
+
+class LexiconLookup(object):
+    '''Diacritic-insensitive lookup of entries by headword, by bisection of
+    their sorted lookup_key()s.'''
+    def __init__(self, entries=()):
+        items = []
+        for entry in entries:
+            entry = lexentry(entry)
+            if entry.headword is not None:
+                items.append((lookup_key(entry.headword), len(items), entry))
+        items.sort(key=lambda item: item[:2])
+        self.keys = [key for key, _, _ in items]
+        self.entries = [entry for _, _, entry in items]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def exact(self, form):
+        '''Return the entries whose headword has the lookup key of `form`.'''
+        key = lookup_key(form)
+        lo = bisect.bisect_left(self.keys, key)
+        return self.entries[lo:bisect.bisect_right(self.keys, key, lo)]
+
+    def prefix(self, form, limit=None):
+        '''Return the entries whose headword key starts with the lookup key of
+        `form`, in key order, at most `limit` of them.'''
+        key = lookup_key(form)
+        lo = bisect.bisect_left(self.keys, key)
+        # U+10FFFF sorts after any character that can follow the prefix.
+        hi = bisect.bisect_left(self.keys, key + '\U0010ffff', lo)
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return self.entries[lo:hi]
+
+    def range(self, start, stop, limit=None):
+        '''Return the entries whose headword key is at least the lookup key of
+        `start` and less than that of `stop`, in key order, at most `limit` of
+        them. Keys are compared by code point.'''
+        lo = bisect.bisect_left(self.keys, lookup_key(start))
+        hi = max(lo, bisect.bisect_left(self.keys, lookup_key(stop), lo))
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return self.entries[lo:hi]
+
+class Profiler(object):
+    '''Wall time, CPU time, item counts and throughput of build stages, timed
+    with `stage()` or `timed()`. CPU time is that of the current process only.'''
+    enabled = True
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name, count=None):
+        '''Time the block as stage `name` that processes `count` items.'''
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add(
+                name, time.perf_counter() - wall, time.process_time() - cpu, count
+            )
+
+    def add(self, name, wall, cpu, count=None):
+        '''Add a timing of stage `name`.'''
+        try:
+            st = self.stages[name]
+        except KeyError:
+            st = self.stages[name] = {'wall': 0.0, 'cpu': 0.0, 'count': 0, 'calls': 0}
+        st['wall'] += wall
+        st['cpu'] += cpu
+        st['calls'] += 1
+        if count is not None:
+            st['count'] += count
+
+    def count(self, name, n):
+        '''Add `n` items to the count of stage `name`.'''
+        self.add(name, 0.0, 0.0, n)
+        self.stages[name]['calls'] -= 1
+
+    def timed(self, name, func):
+        '''Return func wrapped to time each call as one item of stage `name`.'''
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(
+                    name, time.perf_counter() - wall, time.process_time() - cpu, 1
+                )
+        return wrapper
+
+    def report(self):
+        '''Return the timings of all stages as a dict.'''
+        stages = {}
+        for name, st in self.stages.items():
+            stages[name] = dict(st)
+            stages[name]['per_sec'] = st['count'] / st['wall'] if st['wall'] > 0 else None
+        return {'stages': stages}
+
+    def write_report(self, path):
+        '''Write the report as JSON to `path`.'''
+        with open(path, 'w', encoding='utf-8') as out:
+            json.dump(self.report(), out, indent=1, ensure_ascii=False)
+            out.write('\n')
+
+class NullProfiler(object):
+    '''Profiler that records nothing, used when profiling is disabled.'''
+    enabled = False
+    _nullstage = contextlib.nullcontext()
+
+    def stage(self, name, count=None):
+        return self._nullstage
+
+    def add(self, name, wall, cpu, count=None):
+        pass
+
+    def count(self, name, n):
+        pass
+
+    def timed(self, name, func):
+        return func
+
+null_profiler = NullProfiler()
+
+# Renderer, names of the LiftIndex maps it takes, and whether excluded and
+# suffix entries are skipped, for each dictionary target.
+dict_targets = {
+    'de': (
+        entry2dict_de,
+        ('variantmap', 'mainwdmap_es', 'irreg_pl_map'),
+        False
+    ),
+    'acad': (
+        entry2dict_acad,
+        ('variantmap', 'mainwdmap_en', 'irreg_pl_map', 'impf_rt_map'),
+        True
+    ),
+    'acad_es': (
+        entry2dict_acad_es,
+        ('variantmap', 'mainwdmap_acad_es', 'irreg_pl_map', 'impf_rt_map'),
+        True
+    ),
+}
+
+# Renderer, reversal language and generator of the (reversal, POS) pairs of
+# an entry for each reversal target.
+# Spanish reversals are for diccionario escolar.
+rev_targets = {
+    'de_rev': (reventry2dict_de, 'es', entry_reversals),
+    'acad_rev': (reventry2dict_acad, 'en', sense_reversals),
+    'acad_es_rev': (reventry2dict_acad_es, 'eu', entry_reversals),
+}
+
+# Strings written before and after each entry's tex in each dictionary.
+entry_sep = {
+    'de': ('\n\n', ''),
+    'acad': ('', '\n'),
+    'acad_es': ('', '\n'),
+}
+
+def render_entry(entry, renderers, results, counters=None):
+    '''Render entry with each of `renderers` and append the output to the
+    list of its target in `results`, adding its word counts to the
+    WordCounter of its target in `counters`, if given.
+    Return the headword of entry and whether it is excluded or a suffix.'''
+    entry = lexentry(entry)
+    headword = get_headword(entry)
+    skip = is_excluded(entry) or is_suffix(entry)
+    for t, render, maps, skip_excluded in renderers:
+        if skip and skip_excluded:
+            continue
+        counter = None if counters is None else counters[t]
+        d, err = render(entry, *maps, headword=headword, counter=counter)
+        if err is None:
+            results[t].append(d)
+        elif str(err) == 'pass':
+            pass
+        else:
+            print('Error in entry. ', str(err))
+    return headword, skip
+
+def render_outcome(entry, renderers):
+    '''Render entry with each of `renderers` and return its outcome: the
+    rendered entries by target, the word counts it added, the messages it
+    printed, its headword and whether it is excluded or a suffix.'''
+    rendered = {r[0]: [] for r in renderers}
+    counts = {r[0]: WordCounter() for r in renderers}
+    with contextlib.redirect_stdout(io.StringIO()) as messages:
+        headword, skip = render_entry(entry, renderers, rendered, counters=counts)
+    return rendered, counts, messages.getvalue(), headword, skip
+
+def merge_outcome(outcome, results, counters):
+    '''Add the outcome of an entry to `results` and its word counts to the
+    counters of its targets in `counters`, and print its messages. Return its
+    headword and whether it is excluded or a suffix.'''
+    rendered, counts, messages, headword, skip = outcome
+    for t, texentries in rendered.items():
+        results[t] += texentries
+        counters[t].merge(counts[t])
+    sys.stdout.write(messages)
+    return headword, skip
+
+# LiftIndex maps that the renderers look up by headword instead of entry id.
+headword_maps = ('irreg_pl_map',)
+
+@functools.lru_cache(maxsize=None)
+def module_version():
+    '''Return the sha1 of the source of this module, which stamps the on-disk
+    caches so that they are dropped whenever the code changes.'''
+    with open(__file__, 'rb') as fh:
+        return hashlib.sha1(fh.read()).hexdigest()
+
+class RenderCache(object):
+    '''Cache of rendered entries by guid and digest, for incremental rebuilds.
+    It is kept in memory only if `cachedir` is None.'''
+    filename = 'render_cache.pickle'
+
+    def __init__(self, cachedir=None):
+        self.version = module_version()
+        self.path = None
+        stored = {}
+        if cachedir is not None:
+            os.makedirs(cachedir, exist_ok=True)
+            self.path = os.path.join(cachedir, self.filename)
+            try:
+                with open(self.path, 'rb') as fh:
+                    # The version is a separate pickle, so that the outcomes
+                    # of another version, whose classes may no longer exist,
+                    # are never unpickled.
+                    if pickle.load(fh) == self.version:
+                        stored = pickle.load(fh)
+            except Exception:
+                # An unreadable cache only costs a full render.
+                stored = {}
+        self.stored = stored
+        self.current = {}
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+        self.time_rendering = 0.0
+
+    def digest(self, data, targets, deps):
+        '''Return the digest of a serialized entry and its dependencies.'''
+        h = hashlib.sha1(data)
+        h.update(repr((targets, deps)).encode('utf-8'))
+        return h.digest()
+
+    def get(self, guid, digest):
+        '''Return the cached outcome of entry `guid` if its digest matches,
+        else None.'''
+        try:
+            stored_digest, outcome, elapsed = self.stored[guid]
+        except KeyError:
+            stored_digest = None
+        if stored_digest != digest or guid in self.current:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.time_saved += elapsed
+        self.current[guid] = (digest, outcome, elapsed)
+        return outcome
+
+    def put(self, guid, digest, outcome, elapsed):
+        '''Store the outcome of entry `guid` and the time it took to render.'''
+        self.time_rendering += elapsed
+        self.current.setdefault(guid, (digest, outcome, elapsed))
+
+    def save(self):
+        '''Write the outcomes of the entries seen during the build to disk.'''
+        if self.path is not None:
+            tmppath = self.path + '.tmp'
+            with open(tmppath, 'wb') as fh:
+                pickle.dump(self.version, fh, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(self.current, fh, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmppath, self.path)
+        self.stored = self.current
+        self.current = {}
+
+    def report(self):
+        '''Print the hit rate of the cache and the rendering time it saved.'''
+        total = self.hits + self.misses
+        rate = self.hits / total if total > 0 else 0.0
+        print(
+            f'Render cache: {self.hits} hits, {self.misses} misses '
+            f'({rate:.1%} hit rate), {self.time_rendering:.2f}s rendering, '
+            f'{self.time_saved:.2f}s saved'
+        )
+
+class LexiconSnapshot(object):
+    '''On-disk snapshot of the extracted entries and the LiftIndex of a LIFT
+    file. It is valid if the module is unchanged and either the stamp or the
+    sha1 of the file matches, and is restamped if only the stamp changed.'''
+    filename = 'lexicon_snapshot.pickle'
+
+    def __init__(self, cachedir):
+        os.makedirs(cachedir, exist_ok=True)
+        self.path = os.path.join(cachedir, self.filename)
+
+    @staticmethod
+    def filestamp(infile):
+        '''Return the (path, size, mtime) stamp of infile.'''
+        st = os.stat(infile)
+        return (os.path.abspath(infile), st.st_size, st.st_mtime_ns)
+
+    @staticmethod
+    def filehash(infile):
+        '''Return the sha1 of the contents of infile.'''
+        h = hashlib.sha1()
+        with open(infile, 'rb') as fh:
+            for block in iter(functools.partial(fh.read, 1 << 20), b''):
+                h.update(block)
+        return h.hexdigest()
+
+    def load(self, infile):
+        '''Return the (entries, index, messages) snapshot of infile, or None if
+        there is no valid snapshot.'''
+        try:
+            with open(self.path, 'rb') as fh:
+                # The header is a separate pickle, so that a stale snapshot is
+                # rejected without loading the entries.
+                version, stamp, digest = pickle.load(fh)
+                if version != module_version():
+                    return None
+                newstamp = self.filestamp(infile)
+                if stamp != newstamp:
+                    if digest != self.filehash(infile):
+                        return None
+                    # Only the stamp changed (e.g. the file was touched or
+                    # copied). Restamp the snapshot so that later runs don't
+                    # hash the file again.
+                    self._restamp(fh, (version, newstamp, digest))
+                return pickle.load(fh)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None
+
+    def _restamp(self, fh, header):
+        '''Rewrite the snapshot open as fh, positioned after its header, with
+        `header`, copying the pickled entries as they are.'''
+        start = fh.tell()
+        tmppath = self.path + '.tmp'
+        with open(tmppath, 'wb') as out:
+            pickle.dump(header, out, pickle.HIGHEST_PROTOCOL)
+            for block in iter(functools.partial(fh.read, 1 << 20), b''):
+                out.write(block)
+        os.replace(tmppath, self.path)
+        fh.seek(start)
+
+    def save(self, infile, entries, index, messages=''):
+        '''Write the entries and the LiftIndex of infile to the snapshot, with
+        the `messages` printed while building the index.'''
+        header = (module_version(), self.filestamp(infile), self.filehash(infile))
+        tmppath = self.path + '.tmp'
+        with open(tmppath, 'wb') as fh:
+            pickle.dump(header, fh, pickle.HIGHEST_PROTOCOL)
+            pickle.dump((entries, index, messages), fh, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmppath, self.path)
+
+class LexiconStore(object):
+    '''SQLite store of a lexicon at `path`, which `import_lift()` fills from a
+    LIFT export and `entries()` reads back as LexEntry objects.'''
+    # Changes whenever the tables or the way entries are extracted change.
+    schema_version = 1
+    schema = '''
+        CREATE TABLE entries (
+            n INTEGER PRIMARY KEY, id TEXT, guid TEXT, headword TEXT,
+            sortword BLOB, varform TEXT, pos TEXT, excluded INTEGER, suffix INTEGER
+        );
+        CREATE TABLE fields (
+            entry INTEGER REFERENCES entries(n), sense INTEGER, n INTEGER,
+            tag TEXT, type TEXT, lang TEXT, text TEXT
+        );
+        CREATE TABLE glosses (
+            entry INTEGER REFERENCES entries(n), n INTEGER, text TEXT
+        );
+        CREATE TABLE senses (
+            entry INTEGER REFERENCES entries(n), n INTEGER, id TEXT, guid TEXT,
+            pos TEXT, definitions TEXT
+        );
+        CREATE TABLE examples (
+            entry INTEGER REFERENCES entries(n), sense INTEGER, n INTEGER,
+            iqu TEXT, translations TEXT
+        );
+        CREATE TABLE sense_reversals (
+            entry INTEGER REFERENCES entries(n), sense INTEGER, n INTEGER,
+            lang TEXT, texts TEXT
+        );
+        CREATE TABLE relforms (
+            entry INTEGER REFERENCES entries(n), grp INTEGER, n INTEGER,
+            root TEXT, pos TEXT, forms TEXT
+        );
+        CREATE TABLE relations (
+            entry INTEGER REFERENCES entries(n), n INTEGER, ref TEXT, vartype TEXT
+        );
+        CREATE TABLE variants (main TEXT, vartype TEXT, form TEXT);
+        CREATE TABLE reversals (
+            target TEXT, reversal TEXT, pos TEXT, entry INTEGER REFERENCES entries(n)
+        );
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value);
+        CREATE INDEX entries_guid ON entries(guid);
+        CREATE INDEX entries_id ON entries(id);
+        CREATE INDEX entries_headword ON entries(headword);
+        CREATE INDEX entries_sortword ON entries(sortword);
+        CREATE INDEX entries_pos ON entries(pos);
+        CREATE INDEX fields_entry ON fields(entry, sense, n);
+        CREATE INDEX glosses_entry ON glosses(entry, n);
+        CREATE INDEX senses_entry ON senses(entry, n);
+        CREATE INDEX senses_guid ON senses(guid);
+        CREATE INDEX senses_pos ON senses(pos);
+        CREATE INDEX examples_entry ON examples(entry, sense, n);
+        CREATE INDEX sense_reversals_entry ON sense_reversals(entry, sense, n);
+        CREATE INDEX relforms_entry ON relforms(entry, grp, n);
+        CREATE INDEX relations_entry ON relations(entry, n);
+        CREATE INDEX relations_ref ON relations(ref);
+        CREATE INDEX variants_main ON variants(main);
+        CREATE INDEX reversals_reversal ON reversals(target, reversal);
+        CREATE INDEX reversals_pos ON reversals(pos);
+    '''
+    magic = b'SQLite format 3\x00'
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+
+    def close(self):
+        self.db.close()
+
+    @classmethod
+    def is_store(cls, path):
+        '''Return True if the file at `path` is an SQLite database.'''
+        try:
+            with open(path, 'rb') as fh:
+                return fh.read(len(cls.magic)) == cls.magic
+        except OSError:
+            return False
+
+    @classmethod
+    def import_lift(cls, infile, path):
+        '''Load the LIFT export `infile` into a new store at `path`, replacing
+        any database there, and return the store.'''
+        entries = [LexEntry(entry) for entry in parse_entries(infile)]
+        index = LiftIndex(entries)
+        tmppath = path + '.tmp'
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+        store = cls(tmppath)
+        with store.db:
+            store.db.executescript(cls.schema)
+            store.add(entries, index)
+        store.close()
+        os.replace(tmppath, path)
+        return cls(path)
+
+    def add(self, entries, index):
+        '''Insert LexEntry `entries` and the variants and reversals of their
+        LiftIndex into the tables.'''
+        db = self.db
+        dumps = functools.partial(json.dumps, ensure_ascii=False)
+        revtargets = [(t, lang, reversals_of) for t, (_, lang, reversals_of) in rev_targets.items()]
+        for n, entry in enumerate(entries):
+            headword = entry.headword
+            sortword = None if headword is None else sortkey(headword).sort
+            db.execute(
+                'INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (n, entry.id, entry.guid, headword, sortword, entry.varform,
+                 entry.pos, entry.excluded, entry.suffix)
+            )
+            db.executemany(
+                'INSERT INTO fields VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(n, None, i) + f for i, f in enumerate(entry.fields.fields())] + [
+                    (n, j, i) + f
+                    for j, s in enumerate(entry.senses)
+                    for i, f in enumerate(s.fields.fields())
+                ]
+            )
+            db.executemany(
+                'INSERT INTO glosses VALUES (?, ?, ?)',
+                [(n, i, g) for i, g in enumerate(entry.glosses)]
+            )
+            db.executemany(
+                'INSERT INTO senses VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (n, j, s.id, s.guid, s.pos, dumps(s.definitions))
+                    for j, s in enumerate(entry.senses)
+                ]
+            )
+            db.executemany(
+                'INSERT INTO examples VALUES (?, ?, ?, ?, ?)',
+                [
+                    (n, j, i, x.iqu, dumps(x.translations))
+                    for j, s in enumerate(entry.senses)
+                    for i, x in enumerate(s.examples)
+                ]
+            )
+            db.executemany(
+                'INSERT INTO sense_reversals VALUES (?, ?, ?, ?, ?)',
+                [
+                    (n, j, i, lang, dumps(texts))
+                    for j, s in enumerate(entry.senses)
+                    for i, (lang, texts) in enumerate(
+                        (lang, texts) for lang, revs in s.reversals.items() for texts in revs
+                    )
+                ]
+            )
+            db.executemany(
+                'INSERT INTO relforms VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (n, g, i, rf.root, rf.pos, dumps(rf.forms))
+                    for g, group in enumerate(entry.relforms)
+                    for i, rf in enumerate(group)
+                ]
+            )
+            db.executemany(
+                'INSERT INTO relations VALUES (?, ?, ?, ?)',
+                [(n, i, ref, vartype) for i, (ref, vartype) in enumerate(entry.relations)]
+            )
+            if headword is None or entry.excluded or entry.suffix:
+                continue
+            # The reversals as the reversal dictionaries list them. Their
+            # warnings are printed when the dictionaries are built.
+            with contextlib.redirect_stdout(io.StringIO()):
+                db.executemany(
+                    'INSERT INTO reversals VALUES (?, ?, ?, ?)',
+                    [
+                        (t, rev, pos, n)
+                        for t, lang, reversals_of in revtargets
+                        for rev, pos in reversals_of(entry, headword, lang)
+                    ]
+                )
+        db.executemany(
+            'INSERT INTO variants VALUES (?, ?, ?)',
+            [
+                (main, vartype, form)
+                for main, byvartype in index.variantmap.items()
+                for vartype, forms in byvartype.items() for form in forms
+            ]
+        )
+        db.execute(
+            'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+            ('schema_version', self.schema_version)
+        )
+
+    def check(self):
+        '''Raise ValueError if the database is not a store of the current
+        `schema_version`.'''
+        try:
+            row = self.db.execute(
+                'SELECT value FROM meta WHERE key = ?', ('schema_version',)
+            ).fetchone()
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            raise ValueError(f'{self.path} is not an iquito_dict store')
+        if row[0] != self.schema_version:
+            raise ValueError(
+                f'{self.path} has store schema version {row[0]}, not '
+                f'{self.schema_version}; import the LIFT export again'
+            )
+
+    def _rows(self, table, columns, order, where, params):
+        '''Return an iterator over the rows of `table` of the entries that
+        match `where`, grouped by entry as (entry, rows) pairs.'''
+        sql = f'SELECT entry, {columns} FROM {table}'
+        if where != '':
+            sql += f' WHERE entry IN (SELECT n FROM entries WHERE {where})'
+        cursor = self.db.execute(f'{sql} ORDER BY entry, {order}', params)
+        return itertools.groupby(cursor, key=lambda row: row[0])
+
+    def entries(self, where='', params=()):
+        '''Yield the LexEntry of each row of `entries` that matches the SQL
+        condition `where`, in the order of the LIFT export. The entries are
+        rebuilt from the tables one at a time.'''
+        self.check()
+        tables = {
+            'fields': self._rows('fields', 'sense, tag, type, lang, text', 'sense, n', where, params),
+            'glosses': self._rows('glosses', 'text', 'n', where, params),
+            'senses': self._rows('senses', 'id, guid, pos, definitions', 'n', where, params),
+            'examples': self._rows('examples', 'sense, iqu, translations', 'sense, n', where, params),
+            'sense_reversals': self._rows('sense_reversals', 'sense, lang, texts', 'sense, n', where, params),
+            'relforms': self._rows('relforms', 'grp, root, pos, forms', 'grp, n', where, params),
+            'relations': self._rows('relations', 'ref, vartype', 'n', where, params),
+        }
+        # The next (entry, rows) group of each table.
+        groups = {name: next(rows, None) for name, rows in tables.items()}
+
+        def rows_of(name, n):
+            group = groups[name]
+            if group is None or group[0] != n:
+                return []
+            rows = list(group[1])
+            groups[name] = next(tables[name], None)
+            return rows
+
+        sql = 'SELECT n, id, guid, headword, varform, pos, excluded, suffix FROM entries'
+        if where != '':
+            sql += ' WHERE ' + where
+        for n, eid, guid, headword, varform, pos, excluded, suffix in self.db.execute(
+            sql + ' ORDER BY n', params
+        ):
+            fields = {}
+            for _, sense, tag, ftype, lang, text in rows_of('fields', n):
+                fields.setdefault(sense, []).append((tag, ftype, lang, text))
+            examples = {}
+            for _, sense, iqu, translations in rows_of('examples', n):
+                examples.setdefault(sense, []).append(LexExample.from_values(
+                    iqu, {_intern(k): v for k, v in json.loads(translations).items()}
+                ))
+            reversals = {}
+            for _, sense, lang, texts in rows_of('sense_reversals', n):
+                reversals.setdefault(sense, {}).setdefault(_intern(lang), []).append(
+                    tuple(json.loads(texts))
+                )
+            senses = [
+                LexSense.from_values(
+                    sid, sguid, _intern(spos),
+                    {_intern(k): v for k, v in json.loads(definitions).items()},
+                    FieldTable.from_fields(fields.get(j, ())),
+                    examples.get(j, []), reversals.get(j, {})
+                )
+                for j, (_, sid, sguid, spos, definitions) in enumerate(rows_of('senses', n))
+            ]
+            relforms = []
+            for _, grp, root, rpos, forms in rows_of('relforms', n):
+                if grp == len(relforms):
+                    relforms.append([])
+                relforms[grp].append(LexRelForm.from_values(
+                    {_intern(k): v for k, v in json.loads(forms).items()}, root, rpos
+                ))
+            yield LexEntry.from_values(
+                eid, guid, headword, varform, _intern(pos), bool(excluded), bool(suffix),
+                FieldTable.from_fields(fields.get(None, ())),
+                [text for _, text in rows_of('glosses', n)],
+                senses, relforms,
+                [(ref, vartype) for _, ref, vartype in rows_of('relations', n)],
+            )
+
+    def index(self):
+        '''Return the LiftIndex of the entries of the store, printing its
+        warnings. Only the strings the maps need are kept.'''
+        return LiftIndex(self.entries(), keep_entries=False)
+
+    def load(self):
+        '''Return the entries of the store and their LiftIndex, printing the
+        warnings of the index.'''
+        entries = list(self.entries())
+        return entries, LiftIndex(entries)
+
+    def find(self, headword):
+        '''Return the entries with `headword`.'''
+        return list(self.entries('headword = ?', (headword,)))
+
+    def get(self, guid):
+        '''Return the entry with `guid`, or None.'''
+        for entry in self.entries('guid = ?', (guid,)):
+            return entry
+        return None
+
+    def variants(self, eid):
+        '''Return the (variant type, form) pairs of the variants of entry `eid`.'''
+        return self.db.execute(
+            'SELECT vartype, form FROM variants WHERE main = ?', (eid,)
+        ).fetchall()
+
+    def reversals(self, target, reversal):
+        '''Return the (part of speech, headword) pairs that reversal target
+        `target` (e.g. 'acad_rev') lists under `reversal`.'''
+        return self.db.execute(
+            'SELECT r.pos, e.headword FROM reversals r JOIN entries e ON r.entry = e.n '
+            'WHERE r.target = ? AND r.reversal = ? ORDER BY e.n', (target, reversal)
+        ).fetchall()
+
+def _entry_digest(cache, entry, targets, depmaps):
+    '''Return the cache digest of LexEntry entry.'''
+    headword = get_headword(entry)
+    deps = [
+        m.get(headword if name in headword_maps else entry.id)
+        for name, m in depmaps
+    ]
+    return cache.digest(repr(entry).encode('utf-8'), targets, deps)
+
+def render_entry_cached(entry, renderers, results, cache, depmaps, counters):
+    '''Like render_entry(), but serve the outcome of entry from `cache` if
+    entry and its dependencies are unchanged.'''
+    targets = [r[0] for r in renderers]
+    entry = lexentry(entry)
+    digest = _entry_digest(cache, entry, targets, depmaps)
+    outcome = cache.get(entry.guid, digest)
+    if outcome is None:
+        start = time.perf_counter()
+        outcome = render_outcome(entry, renderers)
+        cache.put(entry.guid, digest, outcome, time.perf_counter() - start)
+    return merge_outcome(outcome, results, counters)
+
+# Renderers of the current worker process, set by _init_render_worker.
+_worker_renderers = None
+
+def _init_render_worker(renderers):
+    global _worker_renderers
+    _worker_renderers = renderers
+
+def _render_chunk(chunk):
+    '''Render a chunk of LexEntry objects in a worker process. Return the
+    outcome of each entry and the time it took to render.'''
+    outcomes = []
+    for entry in chunk:
+        start = time.perf_counter()
+        outcome = render_outcome(entry, _worker_renderers)
+        outcomes.append((outcome, time.perf_counter() - start))
+    return outcomes
+
+def _iterchunks(entries, chunksize, collect, lookup):
+    '''Group entries into chunks for the worker processes, calling `collect`
+    on each entry on the way. Each item of a chunk is a list of the LexEntry,
+    its guid, its cache digest and its cached outcome, as returned by
+    `lookup`.'''
+    chunk = []
+    for entry in entries:
+        entry = lexentry(entry)
+        collect(entry)
+        chunk.append(lookup(entry))
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+def build(entries, index, targets=None, jobs=1, chunksize=500, run_size=None,
+          cache=None, profiler=None, finished=None):
+    '''Render entries for each of `targets` in a single pass, in `jobs`
+    processes if it is greater than 1, reusing the unchanged entries of a
+    RenderCache `cache` and spilling runs of `run_size` entries to disk if it
+    is given. Return the sorted entries and the WordCounter of each target,
+    calling `finished` with each target as soon as its entries are sorted.'''
+    if targets is None:
+        targets = list(dict_targets) + list(rev_targets)
+    if profiler is None:
+        profiler = null_profiler
+    counters = {t: WordCounter() for t in targets}
+    if run_size is None:
+        results = {t: [] for t in targets}
+    else:
+        results = {t: ExternalSorter(run_size) for t in targets}
+    renderers = [
+        (t, dict_targets[t][0], [getattr(index, m) for m in dict_targets[t][1]], dict_targets[t][2])
+        for t in targets if t in dict_targets
+    ]
+    revtargets = [t for t in targets if t in rev_targets]
+    revindex = ReversalIndex(revtargets)
+    add_reversals = revindex.add
+    if profiler.enabled and jobs <= 1:
+        renderers = [
+            (t, profiler.timed(f'render {t}', render), maps, skip_excluded)
+            for t, render, maps, skip_excluded in renderers
+        ]
+        add_reversals = profiler.timed('collect reversals', add_reversals)
+    depmaps = [
+        (m, getattr(index, m)) for m in sorted(set(
+            m for t in targets if t in dict_targets for m in dict_targets[t][1]
+        ))
+    ]
+    cachetargets = [r[0] for r in renderers]
+
+    def lookup(entry):
+        if cache is None:
+            return [entry, None, None, None]
+        digest = _entry_digest(cache, entry, cachetargets, depmaps)
+        outcome = cache.get(entry.guid, digest)
+        return [None if outcome is not None else entry, entry.guid, digest, outcome]
+
+    def collect(entry, headword=None, skip=None):
+        if len(revtargets) > 0:
+            add_reversals(entry, headword, skip)
+
+    nentries = 0
+    with profiler.stage('render'):
+        if jobs > 1 and len(renderers) > 0:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=jobs, initializer=_init_render_worker, initargs=(renderers,)
+            ) as executor:
+                # Keep a bounded number of chunks in flight and merge them in order.
+                pending = collections.deque()
+                for chunk in _iterchunks(entries, chunksize, collect, lookup):
+                    nentries += len(chunk)
+                    todo = [item[0] for item in chunk if item[3] is None]
+                    pending.append((executor.submit(_render_chunk, todo), chunk))
+                    if len(pending) >= 2 * jobs:
+                        _merge_chunk(*pending.popleft(), results, cache, counters)
+                while len(pending) > 0:
+                    _merge_chunk(*pending.popleft(), results, cache, counters)
+        elif cache is not None:
+            for entry in entries:
+                nentries += 1
+                entry = lexentry(entry)
+                headword, skip = render_entry_cached(
+                    entry, renderers, results, cache, depmaps, counters
+                )
+                collect(entry, headword, skip)
+        else:
+            for entry in entries:
+                nentries += 1
+                entry = lexentry(entry)
+                headword, skip = render_entry(entry, renderers, results, counters=counters)
+                collect(entry, headword, skip)
+    profiler.count('render', nentries)
+    if cache is not None:
+        with profiler.stage('save cache'):
+            cache.save()
+    for t in targets:
+        if t in rev_targets:
+            with profiler.stage(f'sort {t}', revindex.count(t)):
+                revindex.sort(t)
+            render = rev_targets[t][0]
+            with profiler.stage(f'render {t}', revindex.count(t)):
+                for rev, e in revindex.items(t):
+                    d, err = render(rev, e, counter=counters[t])
+                    if err is None:
+                        results[t].append(d)
+                    elif err == 'SCI':
+                        pass
+                    else:
+                        print('Error in reversal entry. ', str(err))
+        with profiler.stage('sort', len(results[t])):
+            results[t].sort(key=sortword_key)
+        if finished is not None:
+            finished(t, results[t])
+    return results, counters
+
+def _merge_chunk(future, chunk, results, cache, counters):
+    '''Merge the outcomes of a worker chunk and the cached outcomes of the
+    chunk into `results` in input order.'''
+    rendered = iter(future.result())
+    for entry, guid, digest, outcome in chunk:
+        if outcome is None:
+            outcome, elapsed = next(rendered)
+            if cache is not None:
+                cache.put(guid, digest, outcome, elapsed)
+        merge_outcome(outcome, results, counters)
+
+def sortword_key(d):
+    '''Sort key of a rendered entry.'''
+    return d['sortword']
+
+class ExternalSorter(object):
+    '''Collect rendered entries and sort them by sortword, spilling sorted
+    runs of `run_size` entries to temporary files. The sorted entries can be
+    iterated over only once.'''
+    def __init__(self, run_size=100000, tmpdir=None):
+        self.run_size = run_size
+        self.tmpdir = tmpdir
+        self.buffer = []
+        self.runs = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, d):
+        self.buffer.append(d)
+        self.count += 1
+        if len(self.buffer) >= self.run_size:
+            self._spill()
+
+    def extend(self, texentries):
+        for d in texentries:
+            self.append(d)
+
+    def __iadd__(self, texentries):
+        self.extend(texentries)
+        return self
+
+    def _spill(self):
+        self.buffer.sort(key=sortword_key)
+        run = tempfile.TemporaryFile(dir=self.tmpdir)
+        pickler = pickle.Pickler(run, pickle.HIGHEST_PROTOCOL)
+        for d in self.buffer:
+            pickler.dump(d)
+            # Don't let the pickler memoize every entry of the run.
+            pickler.clear_memo()
+        run.seek(0)
+        self.runs.append(run)
+        self.buffer = []
+
+    def sort(self, key=sortword_key):
+        '''Sort the run still in memory. Entries are always sorted by
+        sortword, so `key` is accepted only for compatibility with list.'''
+        if key is not sortword_key:
+            raise ValueError('ExternalSorter can only sort by sortword')
+        self.buffer.sort(key=sortword_key)
+
+    @staticmethod
+    def _readrun(run):
+        unpickler = pickle.Unpickler(run)
+        try:
+            while True:
+                yield unpickler.load()
+        except EOFError:
+            pass
+        finally:
+            run.close()
+
+    def __iter__(self):
+        runs = [self._readrun(io.BufferedReader(run, 1 << 16)) for run in self.runs]
+        self.runs = []
+        buffer, self.buffer = self.buffer, []
+        return heapq.merge(*runs, buffer, key=sortword_key)
+
+# Buffer size of the dictionary files.
+write_buffer_size = 1 << 20
+
+def write_chapters(out, texentries, before='', after='\n'):
+    '''Write sorted texentries to `out`, starting a new chapter whenever the
+    first letter changes.'''
+    lastchapter = ''
+    for d in texentries:
+        if d['firstletter'] != lastchapter:
+            out.write('\n' + r'\chapter{' + d['firstletter'] + '}\n\n')
+            lastchapter = d['firstletter']
+        out.write(before + d['tex'] + after)
+
+def iter_chapters(texentries, before='', after='\n'):
+    '''Yield the (letter, tex) of each chapter of sorted texentries, as
+    write_chapters() writes them. Entries before the first chapter, if any,
+    come with the letter ''.'''
+    lastchapter = ''
+    parts = []
+    for d in texentries:
+        if d['firstletter'] != lastchapter:
+            if len(parts) > 0:
+                yield lastchapter, ''.join(parts)
+            parts = ['\n' + r'\chapter{' + d['firstletter'] + '}\n\n']
+            lastchapter = d['firstletter']
+        parts.append(before + d['tex'] + after)
+    if len(parts) > 0:
+        yield lastchapter, ''.join(parts)
+
+def shard_name(part, letter, seen):
+    '''Return a filename for the chapter `letter` of `part` that is safe on
+    case-insensitive filesystems. `seen` counts the names used so far.'''
+    safe = ''.join(
+        c if c in string.ascii_uppercase or c in string.digits else 'u{:04x}'.format(ord(c))
+        for c in letter
+    )
+    name = f'{part}_{safe or "none"}'
+    seen[name] = seen.get(name, 0) + 1
+    if seen[name] > 1:
+        name += f'_{seen[name]}'
+    return name + '.tex'
+
+def write_if_changed(path, text):
+    '''Write text to `path` unless the file already has that content. Return
+    True if the file was written.'''
+    data = text.encode('utf-8')
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as fh:
+                if hashlib.sha1(fh.read()).digest() == hashlib.sha1(data).digest():
+                    return False
+    except OSError:
+        pass
+    tmppath = path + '.tmp'
+    with open(tmppath, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmppath, path)
+    return True
+
+def write_shards(name, outfile, parts):
+    '''Write each chapter of the `parts` of dictionary `name` to its own file
+    and make `outfile` a master file that `\input`s them. Return the number of
+    shards written and the number of shards.'''
+    sharddir = os.path.splitext(outfile)[0]
+    os.makedirs(sharddir, exist_ok=True)
+    relpath = os.path.basename(sharddir)
+    names = []
+    written = 0
+    seen = {}
+    for part, texentries in parts:
+        for letter, tex in iter_chapters(texentries, *entry_sep[name]):
+            fname = shard_name(part, letter, seen)
+            names.append(fname)
+            written += write_if_changed(os.path.join(sharddir, fname), tex)
+    for fname in os.listdir(sharddir):
+        if fname.endswith('.tex') and fname not in names:
+            os.remove(os.path.join(sharddir, fname))
+    master = ''.join(
+        '\\input{' + relpath + '/' + fname + '}\n' for fname in names
+    )
+    write_if_changed(outfile, master)
+    return written, len(names)
+
+def write_dictionary(name, outfile, parts, sharded=False):
+    '''Write the (target, sorted texentries) `parts` of dictionary `name` to
+    `outfile`, or as shards with write_shards() if `sharded` is True. Return
+    the number of chapter files written and the number of chapter files.'''
+    if sharded:
+        return write_shards(name, outfile, parts)
+    with open(outfile, 'w', encoding='utf-8', buffering=write_buffer_size) as out:
+        for _, texentries in parts:
+            write_chapters(out, texentries, *entry_sep[name])
+    return 1, 1
+
+def write_dictionaries(results, outfiles, profiler=None, sharded=False):
+    '''Write the results of `build` to the files in `outfiles` by dictionary
+    name. Return a dict of the (written, total) chapter files of each.'''
+    if profiler is None:
+        profiler = null_profiler
+    counts = {}
+    for name, outfile in outfiles.items():
+        parts = [(t, results[t]) for t in (name, name + '_rev') if t in results]
+        if len(parts) == 0:
+            continue
+        with profiler.stage(f'write {name}', sum(len(p) for _, p in parts)):
+            counts[name] = write_dictionary(name, outfile, parts, sharded=sharded)
+    return counts
+
+
+# Default output filenames of the dictionaries.
+outfile_names = {
+    'de': 'diccionario_escolar_iquito.tex',        # Diccionario escolar
+    'acad': 'dictionary_academic_iquito.tex',      # Academic dictionary (English)
+    'acad_es': 'dictionary_academic_iquito_es.tex', # Academic dictionary (Spanish)
+}
+
+def file_targets(targets=None):
+    '''Return the targets of the output files of `targets`. A dictionary and
+    its reversals share a file, so both are built if either is requested.'''
+    if targets is None:
+        targets = outfile_names
+    names = [name for name in outfile_names if name in targets or name + '_rev' in targets]
+    return names + [name + '_rev' for name in names]
+
+def load_lexicon(infile, cachedir=None, profiler=None):
+    '''Return the LexEntry objects and the LiftIndex of the LIFT file or
+    LexiconStore `infile`, reusing the LexiconSnapshot in `cachedir` if given.'''
+    if profiler is None:
+        profiler = null_profiler
+    if LexiconStore.is_store(infile):
+        with profiler.stage('load store'):
+            store = LexiconStore(infile)
+            try:
+                entries, index = store.load()
+            finally:
+                store.close()
+        profiler.count('load store', len(entries))
+        return entries, index
+    snapshot = LexiconSnapshot(cachedir) if cachedir is not None else None
+    if snapshot is not None:
+        with profiler.stage('load snapshot'):
+            loaded = snapshot.load(infile)
+        if loaded is not None:
+            entries, index, messages = loaded
+            profiler.count('load snapshot', len(entries))
+            sys.stdout.write(messages)
+            return entries, index
+    with profiler.stage('parse'):
+        entries = parse_entries(infile)
+    profiler.count('parse', len(entries))
+    # Only the extracted entries are kept, so the tree is freed here.
+    with profiler.stage('extract', len(entries)):
+        entries = [LexEntry(entry) for entry in entries]
+    # The warnings of the index are kept with the snapshot and printed again
+    # when it is loaded.
+    with profiler.stage('index', len(entries)):
+        with contextlib.redirect_stdout(io.StringIO()) as messages:
+            index = LiftIndex(entries)
+    sys.stdout.write(messages.getvalue())
+    if snapshot is not None:
+        with profiler.stage('save snapshot', len(entries)):
+            snapshot.save(infile, entries, index, messages.getvalue())
+    return entries, index
+
+class LiveLexicon(object):
+    '''The extracted entries and LiftIndex of a LIFT file, brought up to date
+    with each new export by refresh().'''
+    def __init__(self, infile):
+        self.infile = infile
+        self.entries = []
+        # guid -> (sha1 of the <entry> element, LexEntry)
+        self.digests = {}
+        self.index = LiftIndex()
+
+    def refresh(self):
+        '''Read the LIFT file again and update the entries and the index.
+        Return the guids of the entries that were added or changed and of the
+        entries that were removed.'''
+        digests = {}
+        entries = []
+        changed = []
+        for guid, data in serialized_entries(self.infile):
+            digest = hashlib.sha1(data).digest()
+            try:
+                olddigest, entry = self.digests[guid]
+            except KeyError:
+                olddigest = None
+            if olddigest != digest or guid in digests:
+                entry = LexEntry(ET.fromstring(data))
+                changed.append(entry)
+            digests.setdefault(guid, (digest, entry))
+            entries.append(entry)
+        removed = [guid for guid in self.digests if guid not in digests]
+        self.index.update(entries, changed, removed)
+        self.entries = entries
+        self.digests = digests
+        return [entry.guid for entry in changed], removed
+
+# Items that the stages of a pipelined build keep in their queues.
+pipeline_queue_size = 2
+
+def _pipe(items, maxsize=pipeline_queue_size):
+    '''Iterate over `items` in a thread and yield them through a queue of
+    `maxsize` items, so that the thread runs ahead of the consumer by at most
+    `maxsize` items. An exception in the thread is raised in the consumer.
+    If the consumer stops early, the thread stops at its next item.'''
+    q = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run():
+        try:
+            for item in items:
+                if not put((True, item)):
+                    return
+        except BaseException as e:
+            put((False, e))
+            return
+        put((False, None))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while True:
+            ok, item = q.get()
+            if ok:
+                yield item
+            elif item is None:
+                return
+            else:
+                raise item
+    finally:
+        stop.set()
+        thread.join()
+
+def _extract_chunks(infile, chunksize):
+    '''Stream the entries of `infile` and yield them as lists of LexEntry.'''
+    chunk = []
+    for entry in iterentries(infile):
+        chunk.append(LexEntry(entry))
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+def _spooled_chunks(spool, nchunks):
+    '''Yield the `nchunks` chunks pickled to file `spool`.'''
+    spool.seek(0)
+    for _ in range(nchunks):
+        yield pickle.load(spool)
+
+class _Writer(object):
+    '''Thread that writes the dictionaries put to it while the next ones are
+    rendered, with at most `pipeline_queue_size` of them waiting.'''
+    def __init__(self, profiler, sharded):
+        self.profiler = profiler
+        self.sharded = sharded
+        self.queue = queue.Queue(pipeline_queue_size)
+        self.counts = {}
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue
+            name, outfile, parts = item
+            try:
+                with self.profiler.stage(f'write {name}', sum(len(p) for _, p in parts)):
+                    self.counts[name] = write_dictionary(name, outfile, parts, sharded=self.sharded)
+            except BaseException as e:
+                self.error = e
+
+    def put(self, name, outfile, parts):
+        '''Queue the (target, sorted texentries) `parts` of dictionary `name`.'''
+        if self.error is not None:
+            raise self.error
+        self.queue.put((name, outfile, parts))
+
+    def close(self):
+        '''Wait for the queued dictionaries to be written.'''
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+def build_pipelined(infile, outfiles, targets=None, chunksize=500, run_size=None,
+                    profiler=None, sharded=False):
+    '''Build the dictionaries of `targets` from the LIFT file or LexiconStore
+    `infile` with the entries streamed through threaded stages, and write
+    each dictionary to `outfiles` while the next one is rendered. Return the
+    counts of write_dictionaries() and the WordCounter of each target.'''
+    if targets is None:
+        targets = list(dict_targets) + list(rev_targets)
+    if profiler is None:
+        profiler = null_profiler
+    # Finish the targets dictionary by dictionary, so that each can be
+    # written as soon as its reversals are done.
+    names = [name for name in outfiles if name in targets or name + '_rev' in targets]
+    targets = [t for name in names for t in (name, name + '_rev') if t in targets]
+    parts = {name: [] for name in names}
+    writer = _Writer(profiler, sharded)
+
+    def finished(t, texentries):
+        name = t[:-len('_rev')] if t.endswith('_rev') else t
+        parts[name].append((t, texentries))
+        if len(parts[name]) == len([t for t in (name, name + '_rev') if t in targets]):
+            writer.put(name, outfiles[name], parts.pop(name))
+
+    with contextlib.ExitStack() as stack:
+        stack.callback(writer.close)
+        if LexiconStore.is_store(infile):
+            # The store is read in this thread, since its connection can't be
+            # shared.
+            store = LexiconStore(infile)
+            stack.callback(store.close)
+            with profiler.stage('index store'):
+                index = store.index()
+            entries = store.entries()
+        else:
+            index = LiftIndex(keep_entries=False)
+            nentries = 0
+            nchunks = 0
+            spool = stack.enter_context(tempfile.TemporaryFile())
+            with profiler.stage('parse and index'):
+                for chunk in _pipe(_extract_chunks(infile, chunksize)):
+                    for entry in chunk:
+                        index.add(entry)
+                    pickle.dump(chunk, spool, pickle.HIGHEST_PROTOCOL)
+                    nentries += len(chunk)
+                    nchunks += 1
+                index.build_maps()
+            profiler.count('parse and index', nentries)
+            entries = (
+                entry for chunk in _pipe(_spooled_chunks(spool, nchunks)) for entry in chunk
+            )
+        _, counters = build(
+            entries, index, targets=targets, run_size=run_size, profiler=profiler,
+            finished=finished
+        )
+    return writer.counts, counters
+
+def _chunked(items, chunksize):
+    '''Yield lists of `chunksize` consecutive items.'''
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+def _ordered_map(executor, fn, items, inflight):
+    '''Yield fn(item) for each of `items`, computed in `executor` with at
+    most `inflight` items submitted at a time, in input order.'''
+    pending = collections.deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= inflight:
+            yield pending.popleft().result()
+    while len(pending) > 0:
+        yield pending.popleft().result()
+
+def _export_chunk(chunk):
+    '''Extract a chunk of serialized <entry> elements in a worker process.
+    Return the LexEntry of each and its JSON record without the closing
+    brace, or None if it has no headword.'''
+    records = []
+    for xml in chunk:
+        entry = LexEntry(ET.fromstring(xml))
+        records.append((entry, _open_record(entry)))
+    return records
+
+def _open_record(entry):
+    '''Return the pglex_record() of LexEntry entry as JSON without the
+    closing brace, or None if the entry has no headword.'''
+    if entry.headword is None:
+        return None
+    return json.dumps(pglex_record(entry), ensure_ascii=False)[:-1]
+
+def export_json(infile, outfile, ndjson=True, jobs=1, chunksize=500):
+    '''Write the entries of the LIFT file or LexiconStore `infile` to
+    `outfile` as entry2pglex() records, one per line if `ndjson` is True and
+    as a JSON array otherwise. Return the number of records written.'''
+    store = None
+    if LexiconStore.is_store(infile):
+        # The index of a store is complete before the entries are read.
+        store = LexiconStore(infile)
+        index = store.index()
+        results = (
+            [(entry, _open_record(entry)) for entry in chunk]
+            for chunk in _chunked(store.entries(), chunksize)
+        )
+    else:
+        index = LiftIndex(keep_entries=False)
+        if jobs > 1:
+            chunks = _chunked((data for _, data in serialized_entries(infile)), chunksize)
+        else:
+            # Entries are extracted as they are parsed, since iterentries()
+            # clears them afterwards.
+            results = (
+                [(entry, _open_record(entry)) for entry in chunk]
+                for chunk in _chunked(map(LexEntry, iterentries(infile)), chunksize)
+            )
+    count = 0
+    with contextlib.ExitStack() as stack:
+        if store is not None:
+            stack.callback(store.close)
+        elif jobs > 1:
+            executor = stack.enter_context(
+                concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+            )
+            results = _ordered_map(executor, _export_chunk, chunks, 2 * jobs)
+        spool = stack.enter_context(tempfile.TemporaryFile())
+        pickler = pickle.Pickler(spool, pickle.HIGHEST_PROTOCOL)
+        for records in results:
+            for entry, record in records:
+                if store is None:
+                    index.add(entry)
+                if record is None:
+                    print(f'Could not export entry {entry.guid} without a headword')
+                    continue
+                pickler.dump((record, entry.id, entry.relations))
+                pickler.clear_memo()
+                count += 1
+        if store is None:
+            index.build_maps()
+        spool.seek(0)
+        unpickler = pickle.Unpickler(spool)
+        with open(outfile, 'w', encoding='utf-8', buffering=write_buffer_size) as out:
+            out.write('' if ndjson else '[\n')
+            for n in range(count):
+                record, eid, relations = unpickler.load()
+                if n > 0 and not ndjson:
+                    out.write(',\n')
+                out.write(record if ndjson else '  ' + record)
+                for key, value in pglex_links(eid, relations, index):
+                    out.write(', ' + json.dumps(key) + ': ' + json.dumps(value, ensure_ascii=False))
+                out.write('}\n' if ndjson else '}')
+            out.write('' if ndjson else '\n]\n')
+    return count
+
+def build_files(infile, outdir, targets=None, jobs=1, chunksize=500, run_size=None,
+                cachedir=None, profile=None, pipeline=False, sharded=False):
+    '''Build the dictionaries of `targets` from `infile` and write them to
+    `outdir`, each with its reversals. Return the output files by dictionary name
+    and the WordCounter of each target.'''
+    targets = file_targets(targets)
+    if pipeline and (jobs > 1 or cachedir is not None):
+        raise ValueError('A pipelined build cannot use jobs or cachedir')
+    profiler = Profiler() if profile is not None else null_profiler
+    cache = RenderCache(cachedir) if cachedir is not None else None
+    os.makedirs(outdir, exist_ok=True)
+    outfiles = {
+        name: os.path.join(outdir, fname) for name, fname in outfile_names.items()
+        if name in targets or name + '_rev' in targets
+    }
+    if pipeline:
+        counts, wordcounts = build_pipelined(
+            infile, outfiles, targets=targets, chunksize=chunksize, run_size=run_size,
+            profiler=profiler, sharded=sharded
+        )
+    else:
+        entries, index = load_lexicon(infile, cachedir=cachedir, profiler=profiler)
+        results, wordcounts = build(
+            entries, index, targets=targets, jobs=jobs, chunksize=chunksize,
+            run_size=run_size, cache=cache, profiler=profiler
+        )
+        counts = write_dictionaries(results, outfiles, profiler=profiler, sharded=sharded)
+    if sharded:
+        for name, (written, total) in counts.items():
+            print(f'{outfiles[name]}: {written} of {total} chapters written')
+    if cache is not None:
+        cache.report()
+    if profile is not None:
+        profiler.write_report(profile)
+    return outfiles, wordcounts
+
+def watch(infile, outdir, targets=None, interval=2.0, sharded=False, builds=None):
+    '''Rebuild the dictionaries of `targets` in `outdir` whenever the LIFT
+    file `infile` has changed and kept the same stamp for `interval` seconds.
+    Stop after `builds` builds, or run until interrupted if it is None.'''
+    targets = file_targets(targets)
+    lexicon = LiveLexicon(infile)
+    cache = RenderCache()
+    os.makedirs(outdir, exist_ok=True)
+    outfiles = {
+        name: os.path.join(outdir, fname) for name, fname in outfile_names.items()
+        if name in targets or name + '_rev' in targets
+    }
+    built = None
+    pending = None
+    nbuilds = 0
+    while builds is None or nbuilds < builds:
+        try:
+            stamp = LexiconSnapshot.filestamp(infile)
+        except OSError:
+            stamp = None
+        if stamp is not None and stamp != built:
+            if stamp != pending:
+                # Wait one more interval for the export to be finished.
+                pending = stamp
+            else:
+                start = time.perf_counter()
+                built = stamp
+                try:
+                    changed, removed = lexicon.refresh()
+                except SyntaxError as e:
+                    print(f'Could not parse {infile}: {e}')
+                    continue
+                nbuilds += 1
+                results, _ = build(lexicon.entries, lexicon.index, targets=targets, cache=cache)
+                print(
+                    f'{len(changed)} entries added or changed, {len(removed)} removed, '
+                    f'{cache.misses} rendered in {time.perf_counter() - start:.2f}s'
+                )
+                cache.hits = cache.misses = 0
+                if sharded:
+                    counts = write_dictionaries(results, outfiles, sharded=True)
+                    for name, (written, total) in counts.items():
+                        print(f'{outfiles[name]}: {written} of {total} chapters written')
+                    continue
+                for name, outfile in outfiles.items():
+                    text = io.StringIO()
+                    for t in (name, name + '_rev'):
+                        if t in results:
+                            write_chapters(text, results[t], *entry_sep[name])
+                    if write_if_changed(outfile, text.getvalue()):
+                        print(f'Wrote {outfile}')
+                continue
+        time.sleep(interval)
+
+def main(argv=None):
+    '''Command line interface, e.g. `python -m iquito_dict build export.lift`.'''
+    dictionaries = list(outfile_names)
+    parser = argparse.ArgumentParser(
+        prog='python -m iquito_dict',
+        description='Create the Iquito dictionaries from a FLEx LIFT export.'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    p = subparsers.add_parser('import', help='load a LIFT export into an SQLite store')
+    p.add_argument('infile', help='LIFT export')
+    p.add_argument('store', help='SQLite database to create')
+    p = subparsers.add_parser('build', help='build the latex dictionaries')
+    p.add_argument('infile', help='LIFT export or SQLite store')
+    p.add_argument(
+        '-o', '--outdir', default='tex',
+        help='directory of the output files (default: %(default)s)'
+    )
+    p.add_argument(
+        '-t', '--targets', nargs='+', choices=dictionaries, default=dictionaries,
+        metavar='DICT',
+        help='dictionaries to build with their reversals, from {:} (default: all)'.format(
+            ', '.join(dictionaries)
+        )
+    )
+    p.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help='number of worker processes (default: %(default)s)'
+    )
+    p.add_argument(
+        '--chunksize', type=int, default=500,
+        help='entries per worker task (default: %(default)s)'
+    )
+    p.add_argument(
+        '--run-size', type=int, default=None,
+        help='sort in runs of this many entries on disk instead of in memory'
+    )
+    p.add_argument(
+        '--cache-dir',
+        help='directory of the lexicon snapshot and the incremental render cache'
+    )
+    p.add_argument('--profile', metavar='JSON', help='write a timing report to this file')
+    p.add_argument(
+        '--wordcounts', action='store_true',
+        help='print the word counts of each target by chapter'
+    )
+    p.add_argument(
+        '--shards', action='store_true',
+        help='write each chapter to its own file, rewriting only changed chapters'
+    )
+    p.add_argument(
+        '--pipeline', action='store_true',
+        help='stream the entries and write each dictionary while the next one renders'
+    )
+    p = subparsers.add_parser('watch', help='rebuild the latex dictionaries when the LIFT export changes')
+    p.add_argument('infile', help='LIFT export')
+    p.add_argument(
+        '-o', '--outdir', default='tex',
+        help='directory of the output files (default: %(default)s)'
+    )
+    p.add_argument(
+        '-t', '--targets', nargs='+', choices=dictionaries, default=dictionaries,
+        metavar='DICT',
+        help='dictionaries to build with their reversals, from {:} (default: all)'.format(
+            ', '.join(dictionaries)
+        )
+    )
+    p.add_argument(
+        '--interval', type=float, default=2.0,
+        help='seconds between checks of the LIFT export (default: %(default)s)'
+    )
+    p.add_argument(
+        '--shards', action='store_true',
+        help='write each chapter to its own file, rewriting only changed chapters'
+    )
+    p = subparsers.add_parser('export', help='export the lexicon as JSON for the web dictionary')
+    p.add_argument('infile', help='LIFT export or SQLite store')
+    p.add_argument('outfile', help='JSON file to write')
+    p.add_argument(
+        '--format', choices=('ndjson', 'json'), default='ndjson',
+        help='one record per line or a JSON array (default: %(default)s)'
+    )
+    p.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help='number of worker processes (default: %(default)s)'
+    )
+    p.add_argument(
+        '--chunksize', type=int, default=500,
+        help='entries per worker task (default: %(default)s)'
+    )
+    p = subparsers.add_parser('lookup', help='find entries by headword, ignoring tone marks')
+    p.add_argument('infile', help='LIFT export or SQLite store')
+    p.add_argument('form', help='headword to look up')
+    p.add_argument('stop', nargs='?', help='with a second form, list the headwords from form up to stop')
+    p.add_argument('--prefix', action='store_true', help='find headwords that start with form')
+    p.add_argument(
+        '--limit', type=int, default=50,
+        help='maximum number of entries of a prefix or range query (default: %(default)s)'
+    )
+    p.add_argument(
+        '--cache-dir',
+        help='directory of the lexicon snapshot, to skip parsing an unchanged export'
+    )
+    args = parser.parse_args(argv)
+    if args.command == 'build' and args.pipeline and (
+        args.jobs > 1 or args.cache_dir is not None
+    ):
+        parser.error('--pipeline cannot be combined with -j or --cache-dir')
+    if args.command != 'import' and LexiconStore.is_store(args.infile):
+        store = LexiconStore(args.infile)
+        try:
+            store.check()
+        except ValueError as e:
+            parser.error(str(e))
+        finally:
+            store.close()
+    if args.command == 'build':
+        outfiles, wordcounts = build_files(
+            args.infile, args.outdir, targets=args.targets, jobs=args.jobs,
+            chunksize=args.chunksize, run_size=args.run_size,
+            cachedir=args.cache_dir, profile=args.profile, pipeline=args.pipeline,
+            sharded=args.shards
+        )
+        for outfile in outfiles.values():
+            print(f'Wrote {outfile}')
+        if args.wordcounts:
+            for t, counter in wordcounts.items():
+                print(counter.report(f'Word counts of {t}'))
+    elif args.command == 'import':
+        store = LexiconStore.import_lift(args.infile, args.store)
+        count = store.db.execute('SELECT count(*) FROM entries').fetchone()[0]
+        store.close()
+        print(f'Imported {count} entries into {args.store}')
+    elif args.command == 'export':
+        count = export_json(
+            args.infile, args.outfile, ndjson=args.format == 'ndjson',
+            jobs=args.jobs, chunksize=args.chunksize
+        )
+        print(f'Exported {count} entries to {args.outfile}')
+    elif args.command == 'lookup':
+        with contextlib.redirect_stdout(io.StringIO()):
+            entries, _ = load_lexicon(args.infile, cachedir=args.cache_dir)
+        lookup = LexiconLookup(entries)
+        if args.stop is not None:
+            found = lookup.range(args.form, args.stop, limit=args.limit)
+        elif args.prefix:
+            found = lookup.prefix(args.form, limit=args.limit)
+        else:
+            found = lookup.exact(args.form)
+        for entry in found:
+            print('\t'.join([entry.headword, entry.pos or '', '; '.join(entry.glosses), entry.guid]))
+    elif args.command == 'watch':
+        print(f'Watching {args.infile}, press Ctrl-C to stop')
+        try:
+            watch(
+                args.infile, args.outdir, targets=args.targets,
+                interval=args.interval, sharded=args.shards
+            )
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == '__main__':
+    # Run main() of the imported module, so that the classes in pickled
+    # snapshots, caches and stores are those of iquito_dict, not __main__.
+    import iquito_dict
+    iquito_dict.main()
@@ -0,0 +1,22 @@
+import pytest
+
+import iquito_dict as iqdict
+from benchmarks.liftgen import write_lift
+
+@pytest.fixture(scope='session')
+def lift_file(tmp_path_factory):
+    '''A synthetic LIFT export of 300 entries.'''
+    path = tmp_path_factory.mktemp('lift') / 'lexicon.lift'
+    write_lift(str(path), 300, seed=3)
+    return str(path)
+
+@pytest.fixture(scope='session')
+def lexicon(lift_file):
+    '''The extracted entries and the LiftIndex of `lift_file`.'''
+    return iqdict.load_lexicon(lift_file)
+
+@pytest.fixture(scope='session')
+def built(lexicon):
+    '''The results and word counts of a plain build of `lexicon`.'''
+    entries, index = lexicon
+    return iqdict.build(entries, index)
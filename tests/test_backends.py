@@ -0,0 +1,47 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import iquito_dict as iqdict
+
+pytest.importorskip('lxml')
+
+backends = ['etree', 'lxml']
+
+@pytest.fixture
+def backend(request):
+    old = iqdict.xml_backend
+    iqdict.use_backend(request.param)
+    yield request.param
+    iqdict.use_backend(old)
+
+def extracted(lift_file, backend):
+    return [
+        (guid, repr(iqdict.LexEntry(ET.fromstring(data))))
+        for guid, data in iqdict.serialized_entries(lift_file, backend)
+    ]
+
+def test_backends_extract_identical_entries(lift_file, lexicon):
+    entries, _ = lexicon
+    expected = [(e.guid, repr(e)) for e in entries]
+    assert extracted(lift_file, 'etree') == expected
+    assert extracted(lift_file, 'lxml') == expected
+
+@pytest.mark.parametrize('backend', backends, indirect=True)
+def test_live_lexicon_build_is_identical(lift_file, built, backend):
+    lexicon = iqdict.LiveLexicon(lift_file)
+    lexicon.refresh()
+    assert iqdict.build(lexicon.entries, lexicon.index) == built
+    assert lexicon.refresh() == ([], [])
+
+@pytest.mark.parametrize('backend', backends, indirect=True)
+def test_parallel_export_is_identical(tmp_path, lift_file, backend):
+    serial = tmp_path / 'serial.ndjson'
+    parallel = tmp_path / 'parallel.ndjson'
+    iqdict.export_json(lift_file, str(serial))
+    iqdict.export_json(lift_file, str(parallel), jobs=2, chunksize=40)
+    assert parallel.read_bytes() == serial.read_bytes()
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        iqdict.use_backend('sax')
@@ -0,0 +1,27 @@
+import iquito_dict as iqdict
+
+def materialized(results):
+    '''Return the results of build() with each target as a list.'''
+    return {t: list(texentries) for t, texentries in results.items()}
+
+def test_parallel_build_matches_serial(lexicon, built):
+    entries, index = lexicon
+    assert iqdict.build(entries, index, jobs=2, chunksize=23) == built
+
+def test_sorted_runs_match_serial(lexicon, built):
+    entries, index = lexicon
+    results, wordcounts = iqdict.build(entries, index, run_size=40)
+    assert (materialized(results), wordcounts) == built
+
+def test_parallel_sorted_runs_match_serial(lexicon, built):
+    entries, index = lexicon
+    results, wordcounts = iqdict.build(entries, index, jobs=2, chunksize=23, run_size=40)
+    assert (materialized(results), wordcounts) == built
+
+def test_cached_parallel_build_matches_serial(tmp_path, lexicon, built):
+    entries, index = lexicon
+    cold = iqdict.RenderCache(str(tmp_path))
+    assert iqdict.build(entries, index, jobs=2, chunksize=23, cache=cold) == built
+    warm = iqdict.RenderCache(str(tmp_path))
+    assert iqdict.build(entries, index, jobs=2, chunksize=23, cache=warm) == built
+    assert warm.misses == 0
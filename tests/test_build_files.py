@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+import iquito_dict as iqdict
+
+def read(path):
+    with open(path, encoding='utf-8') as fh:
+        return fh.read()
+
+@pytest.fixture(scope='module')
+def full(tmp_path_factory, lift_file):
+    outdir = tmp_path_factory.mktemp('full')
+    outfiles, _ = iqdict.build_files(lift_file, str(outdir))
+    return {name: read(path) for name, path in outfiles.items()}
+
+@pytest.mark.parametrize('targets', [['acad'], ['acad_rev'], ['acad', 'acad_rev']])
+def test_selected_dictionary_keeps_its_reversals(tmp_path, lift_file, full, targets):
+    outfiles, wordcounts = iqdict.build_files(lift_file, str(tmp_path), targets=targets)
+    assert list(outfiles) == ['acad']
+    assert sorted(wordcounts) == ['acad', 'acad_rev']
+    assert read(outfiles['acad']) == full['acad']
+    assert '\\reventry' in full['acad']
+
+def test_selected_dictionary_keeps_reversal_shards(tmp_path, lift_file):
+    iqdict.build_files(lift_file, str(tmp_path))
+    iqdict.build_files(lift_file, str(tmp_path), sharded=True)
+    shards = sorted(os.listdir(tmp_path / 'dictionary_academic_iquito'))
+    assert any(name.startswith('acad_rev_') for name in shards)
+    iqdict.build_files(lift_file, str(tmp_path), targets=['acad'], sharded=True)
+    assert sorted(os.listdir(tmp_path / 'dictionary_academic_iquito')) == shards
+
+def test_file_targets():
+    assert iqdict.file_targets(['de_rev', 'acad']) == ['de', 'acad', 'de_rev', 'acad_rev']
+    assert iqdict.file_targets() == list(iqdict.dict_targets) + list(iqdict.rev_targets)
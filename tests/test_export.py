@@ -0,0 +1,35 @@
+import json
+
+import iquito_dict as iqdict
+
+def read_ndjson(path):
+    with open(path, encoding='utf-8') as fh:
+        return [json.loads(line) for line in fh]
+
+def test_records(tmp_path, lift_file, lexicon):
+    entries, _ = lexicon
+    path = str(tmp_path / 'lexicon.ndjson')
+    count = iqdict.export_json(lift_file, path)
+    records = read_ndjson(path)
+    with_headword = [e for e in entries if e.headword is not None]
+    assert count == len(records) == len(with_headword)
+    for record, entry in zip(records, with_headword):
+        assert record['id'] == entry.guid
+        assert record['sortword'] == iqdict.lookup_key(entry.headword)
+        for vartype in record.get('variants', {}):
+            assert vartype in iqdict.varmap
+
+def test_json_array_matches_ndjson(tmp_path, lift_file):
+    ndjson = str(tmp_path / 'lexicon.ndjson')
+    array = str(tmp_path / 'lexicon.json')
+    iqdict.export_json(lift_file, ndjson)
+    iqdict.export_json(lift_file, array, ndjson=False)
+    with open(array, encoding='utf-8') as fh:
+        assert json.load(fh) == read_ndjson(ndjson)
+
+def test_store_export_matches_lift_export(tmp_path, lift_file):
+    store = str(tmp_path / 'lexicon.db')
+    iqdict.LexiconStore.import_lift(lift_file, store).close()
+    iqdict.export_json(lift_file, str(tmp_path / 'lift.ndjson'))
+    iqdict.export_json(store, str(tmp_path / 'store.ndjson'))
+    assert read_ndjson(str(tmp_path / 'store.ndjson')) == read_ndjson(str(tmp_path / 'lift.ndjson'))
@@ -0,0 +1,68 @@
+import unicodedata
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import iquito_dict as iqdict
+
+def node(eid, form):
+    return ET.fromstring(
+        f'<entry id="{eid}" guid="{eid}"><lexical-unit><form lang="iqu">'
+        f'<text>{form}</text></form></lexical-unit></entry>'
+    )
+
+def strip_tones(s):
+    '''Return s without tone diacritics, keeping ɨ.'''
+    return unicodedata.normalize('NFC', ''.join(
+        c for c in unicodedata.normalize('NFD', s) if c not in '́̀'
+    ))
+
+@pytest.fixture(scope='module')
+def lookup(lexicon):
+    entries, _ = lexicon
+    return iqdict.LexiconLookup(entries)
+
+def ids(entries):
+    return [e.id for e in entries]
+
+def test_forms_ignore_tones_and_markers():
+    lookup = iqdict.LexiconLookup([
+        node('a', 'káa'), node('b', 'kaá='), node('c', 'kaa'), node('d', 'ka'),
+        node('e', '-kɨ́ɨ'), node('f', 'kaaka'),
+    ])
+    assert ids(lookup.exact('kaa')) == ['a', 'b', 'c']
+    assert ids(lookup.exact('KÁÁ')) == ['a', 'b', 'c']
+    assert ids(lookup.exact('kɨɨ')) == ['e']
+    assert ids(lookup.prefix('ka')) == ['d', 'a', 'b', 'c', 'f']
+    assert ids(lookup.prefix('kaa', limit=2)) == ['a', 'b']
+    assert ids(lookup.range('kaa', 'kaaz')) == ['a', 'b', 'c', 'f']
+    assert lookup.exact('kuu') == []
+
+def test_every_headword_is_found(lookup, lexicon):
+    entries, _ = lexicon
+    with_headword = [e for e in entries if e.headword is not None]
+    assert len(lookup) == len(with_headword)
+    for e in with_headword:
+        assert e in lookup.exact(strip_tones(e.headword))
+
+def test_prefix_matches_scan(lookup, lexicon):
+    entries, _ = lexicon
+    for form in ['k', 'ka', 'kaa', 'shɨ', 'tií']:
+        key = iqdict.lookup_key(form)
+        expected = [
+            e for e in entries
+            if e.headword is not None and iqdict.lookup_key(e.headword).startswith(key)
+        ]
+        found = lookup.prefix(form)
+        assert sorted(ids(found)) == sorted(ids(expected))
+        assert lookup.prefix(form, limit=3) == found[:3]
+
+def test_range_matches_scan(lookup, lexicon):
+    entries, _ = lexicon
+    start, stop = iqdict.lookup_key('ka'), iqdict.lookup_key('pi')
+    expected = [
+        e for e in entries
+        if e.headword is not None and start <= iqdict.lookup_key(e.headword) < stop
+    ]
+    assert sorted(ids(lookup.range('ka', 'pi'))) == sorted(ids(expected))
+    assert lookup.range('pi', 'ka') == []
@@ -0,0 +1,52 @@
+import os
+import threading
+
+import pytest
+
+import iquito_dict as iqdict
+
+def read_dir(outdir):
+    '''Return the contents of the files below `outdir` by relative path.'''
+    files = {}
+    for dirpath, _, fnames in os.walk(outdir):
+        for fname in fnames:
+            path = os.path.join(dirpath, fname)
+            with open(path, encoding='utf-8') as fh:
+                files[os.path.relpath(path, outdir)] = fh.read()
+    return files
+
+@pytest.fixture(scope='module')
+def store_file(tmp_path_factory, lift_file):
+    path = str(tmp_path_factory.mktemp('store') / 'lexicon.db')
+    iqdict.LexiconStore.import_lift(lift_file, path).close()
+    return path
+
+@pytest.mark.parametrize('source', ['lift', 'store'])
+@pytest.mark.parametrize('sharded', [False, True])
+def test_pipelined_build_matches_build_files(tmp_path, lift_file, store_file, source, sharded):
+    infile = lift_file if source == 'lift' else store_file
+    _, wordcounts = iqdict.build_files(lift_file, str(tmp_path / 'plain'), sharded=sharded)
+    _, piped = iqdict.build_files(
+        infile, str(tmp_path / 'piped'), pipeline=True, chunksize=37, sharded=sharded
+    )
+    assert read_dir(tmp_path / 'piped') == read_dir(tmp_path / 'plain')
+    assert piped == wordcounts
+
+def test_pipelined_build_with_runs(tmp_path, lift_file):
+    iqdict.build_files(lift_file, str(tmp_path / 'plain'))
+    iqdict.build_files(lift_file, str(tmp_path / 'piped'), pipeline=True, run_size=50)
+    assert read_dir(tmp_path / 'piped') == read_dir(tmp_path / 'plain')
+
+def test_pipe_stops_thread_when_consumer_stops():
+    before = threading.active_count()
+    items = iqdict._pipe(iter(range(1000)))
+    assert next(items) == 0
+    items.close()
+    assert threading.active_count() == before
+
+def test_pipe_raises_error_of_thread():
+    def fail():
+        yield 1
+        raise RuntimeError('parse error')
+    with pytest.raises(RuntimeError, match='parse error'):
+        list(iqdict._pipe(fail()))
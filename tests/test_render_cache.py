@@ -0,0 +1,69 @@
+import iquito_dict as iqdict
+
+def edit_lift(lift_file, path):
+    '''Write `lift_file` to `path` with the first gloss changed.'''
+    with open(lift_file, encoding='utf-8') as fh:
+        text = fh.read()
+    tag = '<gloss lang="ga"><text>'
+    with open(path, 'w', encoding='utf-8') as fh:
+        fh.write(text.replace(tag, tag + 'nuevo ', 1))
+
+def test_warm_build_is_served_from_cache(tmp_path, lexicon, built):
+    entries, index = lexicon
+    cold = iqdict.RenderCache(str(tmp_path))
+    assert iqdict.build(entries, index, cache=cold) == built
+    assert cold.hits == 0
+
+    warm = iqdict.RenderCache(str(tmp_path))
+    assert iqdict.build(entries, index, cache=warm) == built
+    assert warm.misses == 0
+    assert warm.hits == cold.misses
+
+def test_edited_entry_is_rendered_again(tmp_path, lift_file, lexicon):
+    entries, index = lexicon
+    iqdict.build(entries, index, cache=iqdict.RenderCache(str(tmp_path / 'cache')))
+
+    edited = str(tmp_path / 'edited.lift')
+    edit_lift(lift_file, edited)
+    entries, index = iqdict.load_lexicon(edited)
+    cache = iqdict.RenderCache(str(tmp_path / 'cache'))
+    assert iqdict.build(entries, index, cache=cache) == iqdict.build(entries, index)
+    assert cache.misses >= 1
+    assert cache.hits >= len(entries) - 10
+
+def test_other_module_version_drops_cache(tmp_path, monkeypatch, lexicon):
+    entries, index = lexicon
+    iqdict.build(entries, index, cache=iqdict.RenderCache(str(tmp_path)))
+    assert len(iqdict.RenderCache(str(tmp_path)).stored) == len(entries)
+
+    monkeypatch.setattr(iqdict, 'module_version', lambda: 'other')
+    assert iqdict.RenderCache(str(tmp_path)).stored == {}
+
+def test_corrupt_cache_is_ignored(tmp_path):
+    (tmp_path / iqdict.RenderCache.filename).write_bytes(b'not a pickle')
+    assert iqdict.RenderCache(str(tmp_path)).stored == {}
+
+def test_memory_cache_serves_rebuilds(lexicon, built):
+    entries, index = lexicon
+    cache = iqdict.RenderCache()
+    iqdict.build(entries, index, cache=cache)
+    assert iqdict.build(entries, index, cache=cache) == built
+    assert cache.misses == len(entries)
+    assert cache.hits == len(entries)
+
+def test_cache_of_other_version_is_not_unpickled(tmp_path, monkeypatch, lexicon):
+    entries, index = lexicon
+    cache = iqdict.RenderCache(str(tmp_path))
+    iqdict.build(entries, index, cache=cache)
+
+    class OldCounter(iqdict.WordCounter):
+        pass
+    # Outcomes that refer to a class that no longer exists.
+    monkeypatch.setattr(iqdict, 'OldCounter', OldCounter, raising=False)
+    OldCounter.__module__ = 'iquito_dict'
+    OldCounter.__qualname__ = 'OldCounter'
+    cache.current = {'guid': (b'', OldCounter(), 0.0)}
+    cache.version = 'old'
+    cache.save()
+    monkeypatch.delattr(iqdict, 'OldCounter')
+    assert iqdict.RenderCache(str(tmp_path)).stored == {}
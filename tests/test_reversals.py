@@ -0,0 +1,16 @@
+import xml.etree.ElementTree as ET
+
+import iquito_dict as iqdict
+
+def test_sense_without_part_of_speech_has_empty_pos(capsys):
+    entry = iqdict.LexEntry(ET.fromstring(
+        '<entry id="kaa_1" guid="g1">'
+        '<lexical-unit><form lang="iqu"><text>kaa</text></form></lexical-unit>'
+        '<sense id="s1"><grammatical-info value="Verb"/>'
+        '<reversal type="en"><form lang="en"><text>go</text></form></reversal></sense>'
+        '<sense id="s2">'
+        '<reversal type="en"><form lang="en"><text>walk</text></form></reversal></sense>'
+        '</entry>'
+    ))
+    assert list(iqdict.sense_reversals(entry, 'kaa', 'en')) == [('go', 'Verb'), ('walk', '')]
+    assert 'Could not find grammatical-info' in capsys.readouterr().out
@@ -0,0 +1,65 @@
+import os
+import re
+
+import iquito_dict as iqdict
+
+def outfiles(outdir):
+    return {
+        name: os.path.join(str(outdir), fname)
+        for name, fname in iqdict.outfile_names.items()
+    }
+
+def read(path):
+    with open(path, encoding='utf-8') as fh:
+        return fh.read()
+
+def shards(outfile):
+    '''Return the paths of the shards that the master file `outfile` inputs.'''
+    sharddir = os.path.dirname(outfile)
+    return [
+        os.path.join(sharddir, name)
+        for name in re.findall(r'\\input\{([^}]+)\}', read(outfile))
+    ]
+
+def test_shards_concatenate_to_dictionary(tmp_path, built):
+    results, _ = built
+    single = outfiles(tmp_path / 'single')
+    sharded = outfiles(tmp_path / 'sharded')
+    os.makedirs(tmp_path / 'single')
+    os.makedirs(tmp_path / 'sharded')
+    iqdict.write_dictionaries(results, single)
+    counts = iqdict.write_dictionaries(results, sharded, sharded=True)
+    for name in single:
+        paths = shards(sharded[name])
+        assert counts[name] == (len(paths), len(paths))
+        assert ''.join(read(p) for p in paths) == read(single[name])
+
+def test_unchanged_shards_are_not_written(tmp_path, built):
+    results, _ = built
+    files = outfiles(tmp_path)
+    iqdict.write_dictionaries(results, files, sharded=True)
+    mtimes = {p: os.stat(p).st_mtime_ns for f in files.values() for p in shards(f) + [f]}
+    counts = iqdict.write_dictionaries(results, files, sharded=True)
+    assert all(written == 0 for written, _ in counts.values())
+    assert {p: os.stat(p).st_mtime_ns for p in mtimes} == mtimes
+
+def test_removed_chapter_is_deleted(tmp_path, built):
+    results, _ = built
+    files = outfiles(tmp_path)
+    iqdict.write_dictionaries(results, files, sharded=True)
+    before = shards(files['acad'])
+
+    letter = results['acad'][0]['firstletter']
+    edited = dict(results, acad=[d for d in results['acad'] if d['firstletter'] != letter])
+    written, total = iqdict.write_dictionaries(edited, files, sharded=True)['acad']
+    after = shards(files['acad'])
+    assert (written, total) == (0, len(before) - 1)
+    assert after == before[1:]
+    assert not os.path.exists(before[0])
+
+def test_write_if_changed(tmp_path):
+    path = str(tmp_path / 'a.tex')
+    assert iqdict.write_if_changed(path, 'á')
+    assert not iqdict.write_if_changed(path, 'á')
+    assert iqdict.write_if_changed(path, 'é')
+    assert read(path) == 'é'
@@ -0,0 +1,68 @@
+import os
+import shutil
+
+import pytest
+
+import iquito_dict as iqdict
+
+@pytest.fixture
+def lift_copy(tmp_path, lift_file):
+    path = str(tmp_path / 'lexicon.lift')
+    shutil.copy(lift_file, path)
+    return path
+
+def no_parse(*args, **kwargs):
+    raise AssertionError('the LIFT file was parsed')
+
+def test_snapshot_is_reused(tmp_path, monkeypatch, capsys, lift_copy, built):
+    cachedir = str(tmp_path / 'cache')
+    iqdict.load_lexicon(lift_copy, cachedir=cachedir)
+    messages = capsys.readouterr().out
+
+    monkeypatch.setattr(iqdict, 'parse_entries', no_parse)
+    entries, index = iqdict.load_lexicon(lift_copy, cachedir=cachedir)
+    assert capsys.readouterr().out == messages
+    assert iqdict.build(entries, index) == built
+
+def test_touched_file_keeps_snapshot(tmp_path, lift_copy):
+    snapshot = iqdict.LexiconSnapshot(str(tmp_path / 'cache'))
+    entries, index = iqdict.load_lexicon(lift_copy)
+    snapshot.save(lift_copy, entries, index)
+    st = os.stat(lift_copy)
+    os.utime(lift_copy, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert snapshot.load(lift_copy) is not None
+
+def test_touched_file_is_restamped(tmp_path, monkeypatch, lift_copy, built):
+    snapshot = iqdict.LexiconSnapshot(str(tmp_path / 'cache'))
+    entries, index = iqdict.load_lexicon(lift_copy)
+    snapshot.save(lift_copy, entries, index)
+    st = os.stat(lift_copy)
+    os.utime(lift_copy, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert snapshot.load(lift_copy) is not None
+
+    monkeypatch.setattr(iqdict.LexiconSnapshot, 'filehash', staticmethod(no_parse))
+    entries, index, _ = snapshot.load(lift_copy)
+    assert iqdict.build(entries, index) == built
+
+def test_edited_file_invalidates_snapshot(tmp_path, lift_copy):
+    cachedir = str(tmp_path / 'cache')
+    entries, _ = iqdict.load_lexicon(lift_copy, cachedir=cachedir)
+    with open(lift_copy, encoding='utf-8') as fh:
+        text = fh.read()
+    with open(lift_copy, 'w', encoding='utf-8') as fh:
+        fh.write(text.replace('</entry>\n', '</entry>\n<entry id="new_1" guid="new"/>\n', 1))
+    assert iqdict.LexiconSnapshot(cachedir).load(lift_copy) is None
+    edited, _ = iqdict.load_lexicon(lift_copy, cachedir=cachedir)
+    assert len(edited) == len(entries) + 1
+
+def test_other_module_version_invalidates_snapshot(tmp_path, monkeypatch, lift_copy):
+    cachedir = str(tmp_path / 'cache')
+    iqdict.load_lexicon(lift_copy, cachedir=cachedir)
+    monkeypatch.setattr(iqdict, 'module_version', lambda: 'other')
+    assert iqdict.LexiconSnapshot(cachedir).load(lift_copy) is None
+
+def test_corrupt_snapshot_is_ignored(tmp_path, lift_copy):
+    snapshot = iqdict.LexiconSnapshot(str(tmp_path))
+    with open(snapshot.path, 'wb') as fh:
+        fh.write(b'not a pickle')
+    assert snapshot.load(lift_copy) is None
@@ -0,0 +1,133 @@
+import re
+
+import pytest
+
+import iquito_dict as iqdict
+from benchmarks.liftgen import LiftGenerator
+
+acute = '́'
+grave = '̀'
+
+def _str2alpha_replace(s):
+    '''The chain of replacements that str2alpha used to be, against which the
+    compiled normalizer is tested.'''
+    # Canonicalize to lower case.
+    s = s.strip().lower()
+
+    # Remove tex commands.
+    s = re.sub(r'\\\w+{([^}]+)}', r'\1', s)
+
+    # Remove punctuation.
+    s = s.replace('"', '') \
+         .replace('“', '').replace('”', '') \
+         .replace('¿', '').replace('?', '')
+
+    # Morpheme markers do not affect sorting. Remove them.
+    s = s.replace('=', '').replace('-', '').replace('#', '')
+
+    # Replace diacritic digraphs (i.e. vowel+diacritic combinations) with precomposed characters.
+    # (ɨ́ and ɨ̀ don't have precomposed forms.)
+    s = s.replace('á', 'á').replace('é', 'é').replace('í', 'í') \
+         .replace('ó', 'ó').replace('ú', 'ú') \
+         .replace('à', 'à').replace('è', 'è').replace('ì', 'ì') \
+         .replace('ò', 'ò').replace('ù', 'ù')
+
+    # Ignore diacritics by replacing with unmodified character.
+    s = s.replace('á', 'a').replace('é', 'e').replace('í', 'i') \
+         .replace('ɨ́', 'ɨ').replace('ó', 'o').replace('ú', 'u') \
+         .replace('à', 'a').replace('è', 'e').replace('ì', 'i') \
+         .replace('ɨ̀', 'ɨ').replace('ò', 'o').replace('ù', 'u')
+
+    # Replace long vowel sequences with single upper case.
+    s = s.replace('aa', 'A').replace('ee', 'E').replace('ii', 'I') \
+         .replace('ɨɨ', 'Ɨ').replace('oo', 'O').replace('uu', 'U')
+
+    # Clean up bad character data.
+    s = iqdict.cleanstr(s)
+
+    return s
+
+# Written forms with their str2alpha forms: precomposed and combining tones,
+# long vowels with and without tones, ɨ (which has no precomposed forms),
+# tex commands, punctuation and morpheme markers.
+alpha_cases = [
+    ('kaka', 'kaka'),
+    ('káka', 'kaka'),
+    ('ka' + acute + 'ka', 'kaka'),
+    ('kàka', 'kaka'),
+    ('ka' + grave + 'ka', 'kaka'),
+    ('kaaka', 'kAka'),
+    ('kaáka', 'kAka'),
+    ('káaka', 'kAka'),
+    ('kááka', 'kAka'),
+    ('ka' + acute + 'a' + acute + 'ka', 'kAka'),
+    ('kàáka', 'kAka'),
+    ('kaaa', 'kAa'),
+    ('kaaaa', 'kAA'),
+    ('keéki', 'kEki'),
+    ('kiíki', 'kIki'),
+    ('kóoki', 'kOki'),
+    ('kuùki', 'kUki'),
+    ('kɨ' + acute, 'kɨ'),
+    ('kɨ' + grave, 'kɨ'),
+    ('kɨ' + acute + grave, 'kɨ'),
+    ('kɨɨ', 'kƗ'),
+    ('kɨɨ' + acute, 'kƗ'),
+    ('kɨ' + acute + 'ɨ' + acute, 'kƗ'),
+    ('kɨ' + grave + 'ɨ', 'kƗ'),
+    ('kɨ' + acute + 'ɨɨ', 'kƗɨ'),
+    ('Áakɨ', 'Akɨ'),
+    ('  nɨkɨ  ', 'nɨkɨ'),
+    ('-nɨ', 'nɨ'),
+    ('ki=na', 'kina'),
+    ('#kana', 'kana'),
+    ('¿kaa?', 'kA'),
+    ('“kaa”', 'kA'),
+    ('"kaa"', 'kA'),
+    ('\\textit{kaá}', 'kA'),
+    ('\\sp{Inga} kaa', 'inga kA'),
+    ('', ''),
+]
+
+@pytest.mark.parametrize('s, alpha', alpha_cases)
+def test_str2alpha(s, alpha):
+    assert iqdict._str2alpha(s) == alpha
+
+@pytest.mark.parametrize('s, alpha', alpha_cases)
+def test_str2alpha_matches_replacements(s, alpha):
+    assert iqdict._str2alpha(s) == _str2alpha_replace(s)
+
+def test_str2alpha_matches_replacements_on_generated_words():
+    gen = LiftGenerator(seed=6)
+    words = [gen.word() for _ in range(5000)]
+    mismatches = [
+        (w, _str2alpha_replace(w), iqdict._str2alpha(w)) for w in words
+        if iqdict._str2alpha(w) != _str2alpha_replace(w)
+    ]
+    assert mismatches == []
+
+def test_str2sort_orders_long_vowels_after_short():
+    words = ['kaaka', 'kaka', 'kɨ', 'kɨɨ', 'ka', 'kɨka', 'ki']
+    assert sorted(words, key=iqdict.str2sort) == [
+        'ka', 'kaka', 'kaaka', 'ki', 'kɨ', 'kɨka', 'kɨɨ'
+    ]
+
+def test_str2sort_ignores_tones():
+    assert iqdict.str2sort('káaka') == iqdict.str2sort('kaaka')
+    assert iqdict.str2sort('kɨ' + acute) == iqdict.str2sort('kɨ')
+
+def test_str2sort_raises_for_characters_outside_alphabet():
+    with pytest.raises(KeyError):
+        iqdict.str2sort('kaß')
+    assert iqdict.sortkey('kaß').sort is None
+
+@pytest.mark.parametrize('s, letter', [
+    ('kaka', 'k'), ('aaka', 'aa'), ('ɨɨ' + acute + 'ka', 'ɨɨ'), ('-ɨka', 'ɨ'),
+])
+def test_firstletter(s, letter):
+    assert iqdict.firstletter(s) == letter
+
+def test_firstletter_of_empty_string():
+    assert iqdict.sortkey('-').letter is None
+    with pytest.raises(IndexError):
+        iqdict.firstletter('-')
@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+import iquito_dict as iqdict
+
+@pytest.fixture(scope='module')
+def store_path(tmp_path_factory, lift_file):
+    path = str(tmp_path_factory.mktemp('store') / 'lexicon.db')
+    iqdict.LexiconStore.import_lift(lift_file, path).close()
+    return path
+
+@pytest.fixture
+def store(store_path):
+    store = iqdict.LexiconStore(store_path)
+    yield store
+    store.close()
+
+def test_entries_round_trip(store, lexicon):
+    entries, _ = lexicon
+    assert [repr(e) for e in store.entries()] == [repr(e) for e in entries]
+
+def test_build_from_store(store_path, built):
+    assert iqdict.LexiconStore.is_store(store_path)
+    entries, index = iqdict.load_lexicon(store_path)
+    assert iqdict.build(entries, index) == built
+
+def test_find_and_get(store, lexicon):
+    entries, _ = lexicon
+    entry = next(e for e in entries if e.headword is not None)
+    assert entry.guid in [e.guid for e in store.find(entry.headword)]
+    assert repr(store.get(entry.guid)) == repr(entry)
+    assert store.get('no such guid') is None
+
+def test_reversals_skip_suffixes_and_excluded_entries(store):
+    assert store.db.execute(
+        'SELECT count(*) FROM reversals r JOIN entries e ON r.entry = e.n '
+        'WHERE e.excluded OR e.suffix'
+    ).fetchone()[0] == 0
+    target, reversal, pos = store.db.execute(
+        'SELECT target, reversal, pos FROM reversals LIMIT 1'
+    ).fetchone()
+    assert pos in [p for p, _ in store.reversals(target, reversal)]
+
+def test_other_schema_version_is_rejected(tmp_path, lift_file):
+    path = str(tmp_path / 'old.db')
+    store = iqdict.LexiconStore.import_lift(lift_file, path)
+    with store.db:
+        store.db.execute("UPDATE meta SET value = 0 WHERE key = 'schema_version'")
+    with pytest.raises(ValueError, match='import the LIFT export again'):
+        list(store.entries())
+    store.close()
+    with pytest.raises(SystemExit) as e:
+        iqdict.main(['lookup', path, 'ka'])
+    assert e.value.code == 2
+
+def test_other_database_is_rejected(tmp_path):
+    path = str(tmp_path / 'other.db')
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE t (x)')
+    db.commit()
+    db.close()
+    store = iqdict.LexiconStore(path)
+    with pytest.raises(ValueError, match='is not an iquito_dict store'):
+        store.check()
+    store.close()
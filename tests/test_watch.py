@@ -0,0 +1,87 @@
+import os
+import random
+import re
+
+import pytest
+
+import iquito_dict as iqdict
+
+def index_state(index):
+    '''Return the lookups and maps of a LiftIndex, with entries as reprs.'''
+    state = dict(vars(index))
+    for name in ('entries', 'guids'):
+        state[name] = {key: repr(entry) for key, entry in state[name].items()}
+    return state
+
+def read_entries(path):
+    '''Return the header, the <entry> lines and the footer of a generated
+    LIFT file.'''
+    with open(path, encoding='utf-8') as fh:
+        lines = fh.readlines()
+    return lines[:2], lines[2:-1], lines[-1:]
+
+def write_entries(path, header, entries, footer):
+    with open(path, 'w', encoding='utf-8') as fh:
+        fh.writelines(header + entries + footer)
+
+def guid(line):
+    return re.search(r'guid="([^"]+)"', line).group(1)
+
+def edit(rng, entries, round):
+    '''Change, remove and add a few entries. Return the guids of the entries
+    that were added or changed and of those that were removed.'''
+    changed = set()
+    for i in rng.sample(range(len(entries)), 4):
+        tag = '<gloss lang="ga"><text>' if i % 2 == 0 else '<form lang="iqu"><text>'
+        entries[i] = entries[i].replace(tag, tag + 'kaa', 1)
+        changed.add(guid(entries[i]))
+    removed = set()
+    for i in sorted(rng.sample(range(len(entries)), 2), reverse=True):
+        removed.add(guid(entries.pop(i)))
+    for n in range(2):
+        source = entries[rng.randrange(len(entries))]
+        new = re.sub(r'guid="[^"]+"', f'guid="new-{round}-{n}"', source, count=1)
+        new = re.sub(r' id="([^"]+)"', rf' id="\1_{round}_{n}"', new, count=1)
+        entries.insert(rng.randrange(len(entries)), new)
+        changed.add(f'new-{round}-{n}')
+    removed -= changed
+    changed &= set(guid(line) for line in entries)
+    return changed, removed
+
+def test_refresh_matches_fresh_load(tmp_path, lift_file):
+    path = str(tmp_path / 'lexicon.lift')
+    header, entries, footer = read_entries(lift_file)
+    write_entries(path, header, entries, footer)
+    lexicon = iqdict.LiveLexicon(path)
+    changed, removed = lexicon.refresh()
+    assert len(changed) == len(entries) and removed == []
+
+    rng = random.Random(23)
+    for round in range(5):
+        expected = edit(rng, entries, round)
+        write_entries(path, header, entries, footer)
+        changed, removed = lexicon.refresh()
+        assert (set(changed), set(removed)) == expected
+
+        fresh_entries, fresh_index = iqdict.load_lexicon(path)
+        assert [repr(e) for e in lexicon.entries] == [repr(e) for e in fresh_entries]
+        assert index_state(lexicon.index) == index_state(fresh_index)
+        assert iqdict.build(lexicon.entries, lexicon.index) == iqdict.build(fresh_entries, fresh_index)
+
+def test_unchanged_export_changes_nothing(lift_file):
+    lexicon = iqdict.LiveLexicon(lift_file)
+    lexicon.refresh()
+    entries = lexicon.entries
+    assert lexicon.refresh() == ([], [])
+    assert all(a is b for a, b in zip(lexicon.entries, entries))
+
+@pytest.mark.parametrize('sharded', [False, True])
+def test_watch_writes_build_files_output(tmp_path, lift_file, sharded):
+    iqdict.build_files(lift_file, str(tmp_path / 'built'), sharded=sharded)
+    iqdict.watch(lift_file, str(tmp_path / 'watched'), interval=0.01, sharded=sharded, builds=1)
+    for dirpath, _, fnames in os.walk(tmp_path / 'built'):
+        for fname in fnames:
+            path = os.path.join(dirpath, fname)
+            other = os.path.join(tmp_path / 'watched', os.path.relpath(path, tmp_path / 'built'))
+            with open(path, 'rb') as a, open(other, 'rb') as b:
+                assert a.read() == b.read()